@@ -1,48 +1,669 @@
 import os
 import re
+import sys
 import glob
 import json
-import openai
+import time
+import random
+import unicodedata
+import hashlib
+import asyncio
 import argparse
+import itertools
+from collections import Counter
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from typing import Literal
 from pydantic import BaseModel
+from llm_cache import LLMCache, make_key
+from client_pool import ClientPool, TRANSPORT_ERRORS
+from output_writer import StreamingWriter
+from prefilter import pair_similarities
+from telemetry import TelemetryLog, start_metrics_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from run_index import load_question_runs, load_report_runs, load_rubric_index, CACHE_FOLDER  # noqa: E402
+
+try:
+    import tiktoken
+except ImportError:  # Optional: only used to count prompt tokens
+    tiktoken = None
 
 
 # ── Configuration ────────────────────────────────────────────────────────────
-BASE_URL = "http://mooneye.cs.uwaterloo.ca:8000/v1"  # Replace it with your vLLM server address
+BASE_URLS = ["http://mooneye.cs.uwaterloo.ca:8000/v1"]  # Replace it with your vLLM server address(es), one per replica
 MODEL = "openai/gpt-oss-120b"
+CONCURRENCY = 64  # Max number of requests in flight per vLLM replica
+REQUEST_TIMEOUT = 600  # Seconds before a single request is abandoned and retried
+MAX_RETRIES = 4  # Retries per task on transport errors or responses that fail validation
+RETRY_BACKOFF = 2.0  # Base delay in seconds, doubled on each retry (with jitter)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, "..", "data")
+CACHE_PATH = os.path.join(SCRIPT_DIR, "cache", "llm_cache.sqlite")  # Set to None to disable the response cache
+PREFIX_LOG_DIR = None  # Folder for per-request prefix sharing logs (None disables them)
+# Seconds a prefix group's other requests wait after its leader's request is sent, enough for the server to
+# prefill and cache the shared prefix; None holds them until the leader's whole response is back
+PREFIX_WARM_WAIT = 2.0
+# Prompt serialization: "verbose" (indented JSON, full article) or "compact" (no whitespace, fewer fields)
+PROMPT_STYLE = "verbose"
+COMPACT_ARTICLE_DROP_FIELDS = ["docid", "headings"]  # Article fields left out of compact prompts
+MAX_QUESTION_EXAMPLES = None  # Few-shot example questions per rubric question (None keeps all)
+MAX_REPORT_EXAMPLES = None  # Organizer example reports per prompt (None keeps all)
+TOKEN_REPORT_DIR = None  # Folder for per-task prompt token reports (None disables them)
+DRY_RUN = False  # Build prompts and write token reports without calling the judge
+NUM_SHARDS = 1  # Split each task list over this many independent processes or machines
+SHARD_INDEX = 0  # Which shard this process runs (0 .. NUM_SHARDS - 1)
+CHECKPOINT_INTERVAL = 10  # Seconds between durable checkpoints of the partial output
+# Question pair prefilter: pairs less similar than the threshold are labeled very-different without a
+# judge call (None disables it). Calibrate the threshold with prefilter.py.
+PREFILTER_THRESHOLD = None
+PREFILTER_METHOD = "tfidf"  # "tfidf", or "embedding" with a local sentence-transformers model
+PREFILTER_MODEL_PATH = None
+DEDUP = True  # Judge candidate questions that are identical after canonicalization only once
+CASCADE_MODEL = None  # Cheap first-pass judge; None judges every task with MODEL
+CASCADE_BASE_URLS = None  # Endpoints serving CASCADE_MODEL (None: the BASE_URLS replicas)
+CASCADE_CONFIDENCE = "logprobs"  # "logprobs" of the decision tokens, or "consistency" of CASCADE_SAMPLES samples
+CASCADE_THRESHOLD = 0.9  # First-pass answers less confident than this are escalated to MODEL
+CASCADE_SAMPLES = 5
+CASCADE_TEMPERATURE = 0.7  # Sampling temperature of the self-consistency samples
+TELEMETRY_PATH = None  # JSONL file that every judge request is logged to (None disables the log)
+METRICS_PORT = None  # Port to export live Prometheus metrics on (None disables them)
 # Organizer runs used as few-shot examples, excluded from judging
 question_organizer_runs = ['organizer-gpt-oss-t1', 'dragun-organizers-starter-kit-task-1',
                            'organizer-t1-perplex', 'organizer-t1-chatgpt']
 report_organizer_runs = ['organizer-gpt-oss-t2', 'dragun-organizers-starter-kit-task-2']
 # ─────────────────────────────────────────────────────────────────────────────
 
-client = openai.OpenAI(base_url=BASE_URL, api_key="EMPTY")
 
-
-def call_llm(system_prompt, user_input, response_schema, schema_name="assessment"):
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
+def chat_request(model, system_prompt, user_input, response_schema, schema_name):
+    return {
+        "model": model,
+        "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_input},
         ],
-        response_format={
+        "response_format": {
             "type": "json_schema",
             "json_schema": {"name": schema_name, "schema": response_schema},
         },
+        "top_p": 1,
+    }
+
+
+def sanitize(content):
+    # Sanitize control characters that may break JSON parsing
+    return re.sub(r"[\x00-\x1f\x7f]", " ", content or "")
+
+
+async def call_llm(client, system_prompt, user_input, response_schema, schema_name="assessment"):
+    response = await client.chat.completions.create(
+        **chat_request(MODEL, system_prompt, user_input, response_schema, schema_name),
         temperature=0,
-        top_p=1,
     )
     reasoning = response.choices[0].message.reasoning_content
-    content = response.choices[0].message.content
-    # Sanitize control characters that may break JSON parsing
-    content = re.sub(r"[\x00-\x1f\x7f]", " ", content)
-    return reasoning, content
+    content = sanitize(response.choices[0].message.content)
+    return reasoning, content, response.usage
+
+
+def usage_tokens(usage, reasoning=None):
+    # Token counts of a response. If the server leaves reasoning tokens out, they are counted from the text,
+    # but only for telemetry, so runs without it never load tiktoken.
+    if usage is None:
+        return {}
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    completion_details = getattr(usage, "completion_tokens_details", None)
+    reasoning_tokens = getattr(completion_details, "reasoning_tokens", None)
+    if reasoning_tokens is None and reasoning and (TELEMETRY_PATH or METRICS_PORT):
+        reasoning_tokens = count_tokens(reasoning)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "reasoning_tokens": reasoning_tokens,
+        "cached_tokens": getattr(prompt_details, "cached_tokens", None),
+    }
+
+
+# ── Cascade first pass ───────────────────────────────────────────────────────
+
+DECISION_RE = re.compile(r'"assessment_decision"\s*:\s*"([^"]*)"')
+
+
+def decisions(result):
+    # Decision per assessed item (answer id, candidate rank, or one unnamed item), comparable across samples
+    items = getattr(result, "assessments", [result])
+    return {json.dumps(a.model_dump(exclude={"rationale", "assessment_decision"}), sort_keys=True):
+            a.assessment_decision for a in items}
+
+
+def decision_confidence(content, logprobs):
+    # Probability of the least certain decision: the product of the probabilities of the tokens
+    # spelling out its value. No logprobs means no confidence, so the task is escalated.
+    tokens = getattr(logprobs, "content", None) or []
+    spans = [m.span(1) for m in DECISION_RE.finditer(content)]
+    if not tokens or not spans:
+        return 0.0
+    # Tokens are lined up with the text in UTF-8 bytes: byte-fallback and partial-character tokens
+    # (accents, dashes, curly quotes) have token strings whose length differs from the text they cover
+    encoded = content.encode()
+    lengths = np.array([len(t.bytes) if getattr(t, "bytes", None) is not None else len(t.token.encode())
+                        for t in tokens])
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    if ends[-1] != len(encoded):
+        return 0.0  # The tokens do not spell out the content, so the decision tokens cannot be found
+    token_logprobs = np.array([t.logprob for t in tokens])
+    byte_spans = [(len(content[:start].encode()), len(content[:end].encode())) for start, end in spans]
+    return float(min(np.exp(token_logprobs[(starts < end) & (ends > start)].sum()) for start, end in byte_spans))
+
+
+async def call_first_pass(client, system_prompt, user_input, response_schema, response_model,
+                          schema_name="assessment"):
+    # Same request as call_llm, sent to CASCADE_MODEL, plus a confidence in its decisions: from the
+    # logprobs of the decision tokens, or the share of sampled responses agreeing with each majority decision
+    consistency = CASCADE_CONFIDENCE == "consistency"
+    response = await client.chat.completions.create(
+        **chat_request(CASCADE_MODEL, system_prompt, user_input, response_schema, schema_name),
+        temperature=CASCADE_TEMPERATURE if consistency else 0,
+        n=CASCADE_SAMPLES if consistency else 1,
+        logprobs=not consistency,
+    )
+    contents = [sanitize(c.message.content) for c in response.choices]
+    choice = 0
+    if consistency:
+        votes = []
+        for content in contents:
+            try:
+                votes.append(decisions(response_model.model_validate_json(content)))
+            except ValueError:
+                votes.append(None)
+        valid = [v for v in votes if v is not None]
+        confidence = 0.0
+        if valid:
+            # The least agreed-on decision sets the confidence; the answer kept agrees most with the majorities
+            majority = {item: Counter(v.get(item) for v in valid).most_common(1)[0] for item in set().union(*valid)}
+            confidence = min(count for _, count in majority.values()) / len(votes)
+            choice = max(range(len(votes)), key=lambda k: -1 if votes[k] is None else
+                         sum(votes[k].get(item) == decision for item, (decision, _) in majority.items()))
+    else:
+        confidence = decision_confidence(contents[0], response.choices[0].logprobs)
+    reasoning = getattr(response.choices[choice].message, "reasoning_content", None)
+    return reasoning, contents[choice], response.usage, confidence
+
+
+def cascade_columns(judge_model=None, confidence=None):
+    # In cascade mode every output row records which model decided it and the first-pass confidence.
+    # Rows no model judged (pairs skipped as compound or by the prefilter) say "none", and an escalation after a failed
+    # first pass has confidence "failed"; neither is read as a missing value.
+    if not CASCADE_MODEL:
+        return {}
+    if judge_model is None:
+        return {"judge_model": "none", "first_pass_confidence": "none"}
+    return {"judge_model": judge_model,
+            "first_pass_confidence": "failed" if confidence is None else f"{confidence:.4f}"}
+
+
+_encoding = None  # tiktoken encoding, loaded on first use; False if unavailable
+
+
+def load_encoding():
+    # gpt-oss uses the o200k_harmony encoding; tiktoken downloads it once, or reads TIKTOKEN_CACHE_DIR offline
+    if tiktoken is not None:
+        for name in ["o200k_harmony", "o200k_base"]:
+            try:
+                return tiktoken.get_encoding(name)
+            except Exception:
+                continue
+    print("Warning: no tiktoken encoding available, token counts are estimated at ~4 characters per token")
+    return False
+
+
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        _encoding = load_encoding()
+    if _encoding is False:
+        return len(text) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def schedule_by_prefix(prefixes):
+    # Order tasks so requests sharing a prompt prefix run back to back (stable within a group),
+    # and mark the first task of each group as its leader
+    first_seen = {}
+    for i, prefix in enumerate(prefixes):
+        first_seen.setdefault(prefix, i)
+    order = sorted(range(len(prefixes)), key=lambda i: first_seen[prefixes[i]])
+    leaders = set(first_seen.values())
+    return order, leaders
+
+
+def assign_shards(system_prompt, user_inputs, prefixes=None):
+    # Longest-processing-time-first over prefix groups, so a group is never split across judge
+    # servers. Weights use the ~4 characters per token estimate rather than tiktoken, so every
+    # machine computes the same partition whatever is installed.
+    groups = {}
+    for i in range(len(user_inputs)):
+        groups.setdefault(i if prefixes is None else prefixes[i], []).append(i)
+    weights = [(sum(len(system_prompt) + len(user_inputs[i]) for i in g) // 4, g) for g in groups.values()]
+    shard_of = [0] * len(user_inputs)
+    loads = [0] * NUM_SHARDS
+    for weight, g in sorted(weights, key=lambda w: (-w[0], w[1][0])):
+        shard = loads.index(min(loads))
+        loads[shard] += weight
+        for i in g:
+            shard_of[i] = shard
+    return shard_of, loads
+
+
+def run_llm_tasks(system_prompt, user_inputs, response_model, desc, schema_name="assessment", validate=None,
+                  prefixes=None, task_meta=None, on_result=None, skip=(), dedup_keys=None):
+    # Keep up to CONCURRENCY requests in flight so vLLM can batch them; results follow input order.
+    # Validated responses are cached on disk, so reruns only pay for tasks that never completed.
+    # If `prefixes` gives the static leading part of each user input, requests are grouped by prefix
+    # and each group's leader is sent PREFIX_WARM_WAIT seconds ahead, so the others hit vLLM's prefix
+    # cache instead of all prefilling the same article, rubric and examples at once.
+    # With NUM_SHARDS > 1 only this shard's tasks are run, and the others stay None in the results.
+    # Tasks in `skip` are not run either. If `on_result(i, result, columns)` is given, results are handed
+    # to it as they complete instead of being kept, with the cascade columns of the task's output rows.
+    # Tasks with equal `dedup_keys` share one judge call. With CASCADE_MODEL set, each task is first
+    # judged by the cheap model and only escalated to MODEL when that answer is not confident enough.
+    response_schema = response_model.model_json_schema()
+    cache = LLMCache(CACHE_PATH) if CACHE_PATH else None
+    results = [None] * len(user_inputs)
+    if NUM_SHARDS > 1:
+        shard_of, loads = assign_shards(system_prompt, user_inputs, prefixes)
+        print(f"{desc}: shard {SHARD_INDEX} of {NUM_SHARDS} runs {shard_of.count(SHARD_INDEX)}/{len(user_inputs)} "
+              f"tasks, ~{loads[SHARD_INDEX]} of {sum(loads)} estimated prompt tokens "
+              f"(shard loads: {', '.join(map(str, loads))})")
+    else:
+        shard_of = [0] * len(user_inputs)
+    if prefixes is None:
+        # No shared prefix to warm up: every task leads its own group
+        prefixes = [""] * len(user_inputs)
+        order, leaders = list(range(len(user_inputs))), set(range(len(user_inputs)))
+    else:
+        order, leaders = schedule_by_prefix(prefixes)
+    order = [i for i in order if shard_of[i] == SHARD_INDEX and i not in skip]
+    if skip:
+        print(f"{desc}: {sum(shard_of[i] == SHARD_INDEX for i in skip)} tasks already in the output, "
+              f"{len(order)} to go")
+    # Only the first scheduled task of each dedup key is sent; its result is fanned out to the others
+    followers = {}
+    if dedup_keys is not None:
+        representative = {}
+        for i in order:
+            first = representative.setdefault(dedup_keys[i], i)
+            if first != i:
+                followers.setdefault(first, []).append(i)
+        order = [i for i in order if representative[dedup_keys[i]] == i]
+        saved = sum(len(f) for f in followers.values())
+        print(f"{desc}: deduplication saved {saved} judge calls ({len(order)} calls for {len(order) + saved} tasks)")
+    # A group whose leader already completed or was deduplicated gets the first remaining task as its new leader
+    first_remaining = {}
+    for i in order:
+        first_remaining.setdefault(prefixes[i], i)
+    leaders = leaders | set(first_remaining.values())
+    if TOKEN_REPORT_DIR or DRY_RUN:
+        report_prompt_tokens(desc, system_prompt, user_inputs, task_meta, sorted(order))
+        if DRY_RUN:
+            return None
+    # Shared prefix sizes are only counted for the prefix log or token report, so plain runs never load tiktoken
+    prefix_tokens, system_tokens = {}, None
+    if PREFIX_LOG_DIR or TOKEN_REPORT_DIR:
+        prefix_tokens = {prefix: count_tokens(system_prompt + prefix) for prefix in set(prefixes)}
+        system_tokens = count_tokens(system_prompt)
+    prefix_log = []
+
+    outcomes = Counter()
+    cached_calls = Counter()
+    requests_sent = Counter()  # Requests that reached a server per model, retries included
+    telemetry = TelemetryLog(TELEMETRY_PATH)
+
+    def log_call(i, stage, status, retries, endpoint=None, queue_wait=None, latency=None, tokens=None,
+                 confidence=None):
+        telemetry.record(task=desc, schema_name=schema_name, task_index=i, **(task_meta[i] if task_meta else {}),
+                         model=stage["model"], endpoint=endpoint.base_url if endpoint else None, status=status,
+                         retries=retries, queue_wait=None if queue_wait is None else round(queue_wait, 4),
+                         latency=None if latency is None else round(latency, 4), **(tokens or {}),
+                         confidence=confidence)
+
+    async def judge(stage, warm, i, user_input):
+        # One validated response from the stage's model, from the cache or with retries: (result, confidence)
+        first_pass = stage["first_pass"]
+        key_model = MODEL
+        if first_pass:
+            # Samples and logprobs are different requests, so they are cached separately
+            key_model = (f"{CASCADE_MODEL} consistency n={CASCADE_SAMPLES} t={CASCADE_TEMPERATURE}"
+                         if CASCADE_CONFIDENCE == "consistency" else f"{CASCADE_MODEL} logprobs")
+        key = make_key(key_model, system_prompt, user_input, response_schema, schema_name)
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            warm[prefixes[i]].set()
+            cached_calls[stage["model"]] += 1
+            log_call(i, stage, "cached", 0, confidence=cached[2])
+            return response_model.model_validate_json(cached[1]), cached[2]
+        if i not in leaders:
+            await warm[prefixes[i]].wait()
+        for attempt in range(MAX_RETRIES + 1):
+            endpoint = usage = reasoning = queue_wait = latency = confidence = None
+            queue_start = time.perf_counter()
+            try:
+                async with stage["semaphore"]:
+                    endpoint = await stage["pool"].acquire(prefixes[i] or None)
+                    queue_wait = time.perf_counter() - queue_start
+                    shared = system_tokens if i in leaders and attempt == 0 else prefix_tokens.get(prefixes[i])
+                    transport_error = False
+                    requests_sent[stage["model"]] += 1
+                    call_start = time.perf_counter()
+                    if i in leaders and PREFIX_WARM_WAIT is not None:
+                        # The prefix is cached once prefilled, long before the leader's answer is decoded
+                        asyncio.get_running_loop().call_later(PREFIX_WARM_WAIT, warm[prefixes[i]].set)
+                    try:
+                        if first_pass:
+                            reasoning, content, usage, confidence = await call_first_pass(
+                                endpoint.client, system_prompt, user_input, response_schema, response_model,
+                                schema_name)
+                        else:
+                            reasoning, content, usage = await call_llm(endpoint.client, system_prompt, user_input,
+                                                                       response_schema, schema_name)
+                    except TRANSPORT_ERRORS:
+                        transport_error = True
+                        raise
+                    finally:
+                        latency = time.perf_counter() - call_start
+                        stage["pool"].release(endpoint, transport_error)
+                        warm[prefixes[i]].set()
+                result = response_model.model_validate_json(content)
+                if validate is not None:
+                    validate(i, result)
+                break
+            except (*TRANSPORT_ERRORS, ValueError) as e:  # ValueError covers pydantic validation errors
+                log_call(i, stage, type(e).__name__, attempt, endpoint, queue_wait, latency,
+                         usage_tokens(usage, reasoning), confidence)
+                # An invalid first-pass answer is escalated rather than retried
+                if attempt == MAX_RETRIES or (first_pass and isinstance(e, ValueError)):
+                    raise
+                delay = min(RETRY_BACKOFF * 2 ** attempt, 60) * random.uniform(0.5, 1.5)
+                error = " ".join(str(e).split())[:200]
+                tqdm.write(f"{desc}: task {i} attempt {attempt + 1} failed ({type(e).__name__}: {error}), "
+                           f"retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        tokens = usage_tokens(usage, reasoning)
+        log_call(i, stage, "ok", attempt, endpoint, queue_wait, latency, tokens, confidence)
+        prefix_log.append({
+            "task_index": i,
+            "leader": i in leaders,
+            "prompt_tokens": tokens.get("prompt_tokens"),
+            "shared_prefix_tokens": shared,
+            "cached_tokens": tokens.get("cached_tokens"),
+            "endpoint": endpoint.base_url,
+            "retries": attempt,
+            "model": stage["model"],
+            "completion_tokens": tokens.get("completion_tokens"),
+            "latency": round(latency, 3),
+            "confidence": confidence,
+        })
+        if cache:
+            cache.put(key, stage["model"], system_prompt, schema_name, reasoning, content, confidence)
+        return result, confidence
+
+    async def worker(stages, warm, i, user_input):
+        # In cascade mode the first-pass answer stands unless it is invalid or not confident enough
+        confidence = None
+        if "first_pass" in stages:
+            try:
+                result, confidence = await judge(stages["first_pass"], warm, i, user_input)
+            except (*TRANSPORT_ERRORS, ValueError):
+                outcomes["failed"] += 1
+            else:
+                if confidence is not None and confidence >= CASCADE_THRESHOLD:
+                    outcomes["accepted"] += 1
+                    return i, result, cascade_columns(CASCADE_MODEL, confidence)
+                outcomes["low_confidence"] += 1
+        result, _ = await judge(stages["judge"], warm, i, user_input)
+        return i, result, cascade_columns(MODEL, confidence)
+
+    async def dispatch():
+        # CONCURRENCY is per replica, so total throughput scales with the number of endpoints
+        cascade_urls = (CASCADE_BASE_URLS or BASE_URLS) if CASCADE_MODEL else []
+        warm = {prefix: asyncio.Event() for prefix in set(prefixes)}
+        async with (ClientPool(BASE_URLS, timeout=REQUEST_TIMEOUT) as pool,
+                    ClientPool(cascade_urls, timeout=REQUEST_TIMEOUT) as cascade_pool):
+            stages = {"judge": {"model": MODEL, "first_pass": False, "pool": pool,
+                                "semaphore": asyncio.Semaphore(CONCURRENCY * len(BASE_URLS))}}
+            if CASCADE_MODEL:
+                stages["first_pass"] = {"model": CASCADE_MODEL, "first_pass": True, "pool": cascade_pool,
+                                        "semaphore": asyncio.Semaphore(CONCURRENCY * len(cascade_urls))}
+            # Tasks start in creation order, so the semaphore admits requests in prefix order
+            jobs = [asyncio.ensure_future(worker(stages, warm, i, user_inputs[i])) for i in order]
+            try:
+                with tqdm(total=len(jobs) + sum(map(len, followers.values())), desc=desc, unit="task") as pbar:
+                    for job in asyncio.as_completed(jobs):
+                        i, result, columns = await job
+                        for j in [i] + followers.get(i, []):
+                            if j != i:
+                                # Logged so per-run costs count the tasks a new run would have to judge
+                                log_call(j, {"model": columns.get("judge_model") or MODEL}, "deduplicated", 0)
+                            if on_result is not None:
+                                on_result(j, result, columns)
+                            else:
+                                results[j] = result
+                            pbar.update(1)
+            finally:
+                for job in jobs:
+                    job.cancel()
+                await asyncio.gather(*jobs, return_exceptions=True)
+                if len(BASE_URLS) > 1:
+                    print(f"{desc}: {pool.summary()}")
+                if len(cascade_urls) > 1:
+                    print(f"{desc}: first pass {cascade_pool.summary()}")
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(dispatch())
+    finally:
+        if cache:
+            print(f"{desc}: cache hits {cache.hits}/{cache.hits + cache.misses} ({cache.hit_rate():.1%})")
+            cache.close()
+        telemetry.close()
+        report_prefix_sharing(desc, prefix_log, len({prefixes[i] for i in order}))
+        if CASCADE_MODEL:
+            report_cascade(desc, prefix_log, outcomes, cached_calls)
+    elapsed = time.perf_counter() - start
+    sent = sum(requests_sent.values())
+    per_model = f" ({', '.join(f'{n} {model}' for model, n in requests_sent.items())})" if CASCADE_MODEL else ""
+    print(f"{desc}: {sent} requests{per_model} for {len(order)} tasks in {elapsed:.1f}s "
+          f"({sent / max(elapsed, 1e-9):.2f} req/s, concurrency={CONCURRENCY} x {len(BASE_URLS)} endpoints)")
+    return results
+
+
+def report_prefix_sharing(desc, prefix_log, num_groups):
+    if not prefix_log:
+        return
+    log = pd.DataFrame(prefix_log).sort_values("task_index")
+    prompt_tokens = log["prompt_tokens"].sum()
+    if log["shared_prefix_tokens"].notna().any():
+        print(f"{desc}: {num_groups} prefix groups, ~{int(log['shared_prefix_tokens'].sum())} of "
+              f"{prompt_tokens} prompt tokens share a warm prefix")
+    if log["cached_tokens"].notna().any():
+        print(f"{desc}: server reported {int(log['cached_tokens'].sum())} cached prompt tokens "
+              f"({log['cached_tokens'].sum() / max(prompt_tokens, 1):.1%})")
+    if log["retries"].any():
+        print(f"{desc}: {int(log['retries'].sum())} retries across {int((log['retries'] > 0).sum())} tasks")
+    if PREFIX_LOG_DIR:
+        log.to_csv(os.path.join(PREFIX_LOG_DIR, f"{desc}_prefix_log.csv"), index=False)
+
+
+def report_cascade(desc, prefix_log, outcomes, cached_calls):
+    # Per-stage calls, tokens and latency, and where the first pass sent its tasks
+    log = pd.DataFrame(prefix_log, columns=["model", "prompt_tokens", "completion_tokens", "latency"])
+    for stage, model in [("first pass", CASCADE_MODEL), ("judge", MODEL)]:
+        calls = log[log["model"] == model]
+        latency = (f"latency mean {calls['latency'].mean():.2f}s, p95 {np.percentile(calls['latency'], 95):.2f}s"
+                   if len(calls) else "no latency")
+        print(f"{desc}: {stage} ({model}): {len(calls)} calls + {cached_calls[model]} cached, "
+              f"{int(calls['prompt_tokens'].sum())} prompt + {int(calls['completion_tokens'].sum())} completion "
+              f"tokens, {latency}")
+    first_pass = sum(outcomes.values())
+    escalated = outcomes["low_confidence"] + outcomes["failed"]
+    print(f"{desc}: first pass kept {outcomes['accepted']}/{first_pass} tasks, escalated {escalated} "
+          f"({outcomes['low_confidence']} below confidence {CASCADE_THRESHOLD}, {outcomes['failed']} failed)")
+
+
+def report_prompt_tokens(desc, system_prompt, user_inputs, task_meta=None, indices=None):
+    # Tokens of the system and user messages, excluding the chat template overhead
+    indices = list(range(len(user_inputs))) if indices is None else indices
+    counts = np.array([count_tokens(system_prompt + user_inputs[i]) for i in indices], dtype=int)
+    if len(counts):
+        print(f"{desc}: {len(counts)} prompts, {counts.sum()} prompt tokens "
+              f"(mean {counts.mean():.0f}, p50 {np.percentile(counts, 50):.0f}, "
+              f"p95 {np.percentile(counts, 95):.0f}, max {counts.max()})"
+              f"{' [estimated]' if _encoding is False else ''}")
+    if TOKEN_REPORT_DIR:
+        report = pd.DataFrame([task_meta[i] for i in indices]) if task_meta else pd.DataFrame(index=range(len(counts)))
+        report.insert(0, "task_index", indices)
+        report["prompt_tokens"] = counts
+        report.to_csv(os.path.join(TOKEN_REPORT_DIR, f"{desc}_token_report.csv"), index=False)
+
+
+# ── Prompt serialization ─────────────────────────────────────────────────────
+
+def to_prompt_json(obj):
+    if PROMPT_STYLE == "compact":
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def prompt_article(article):
+    if PROMPT_STYLE == "compact":
+        return {k: v for k, v in article.items() if k not in COMPACT_ARTICLE_DROP_FIELDS}
+    return article
+
+
+def select_question_examples(rq_examples):
+    if PROMPT_STYLE == "compact":
+        # Organizer runs often repeat a question with the same label
+        unique = []
+        for example in rq_examples:
+            if example not in unique:
+                unique.append(example)
+        rq_examples = unique
+    if MAX_QUESTION_EXAMPLES is None or len(rq_examples) <= MAX_QUESTION_EXAMPLES:
+        return rq_examples
+    # Most organizer questions are the default very-different; keep the informative labels first,
+    # but present the kept examples in their original order
+    ranked = sorted(range(len(rq_examples)), key=lambda i: next(iter(rq_examples[i].values())) == "very-different")
+    keep = set(ranked[:MAX_QUESTION_EXAMPLES])
+    return [e for i, e in enumerate(rq_examples) if i in keep]
+
+
+# ── Output files and shard merging ───────────────────────────────────────────
+
+def task_fingerprint(system_prompt, task_keys):
+    # Identifies the task list and everything that shapes its prompts, so shards and checkpoints
+    # from different settings are never mixed
+    settings = [MODEL, PROMPT_STYLE, MAX_QUESTION_EXAMPLES, MAX_REPORT_EXAMPLES, DEDUP, system_prompt]
+    if CASCADE_MODEL:
+        settings += [CASCADE_MODEL, CASCADE_CONFIDENCE, CASCADE_THRESHOLD, CASCADE_SAMPLES, CASCADE_TEMPERATURE]
+    return hashlib.sha256(json.dumps([settings, task_keys], default=str).encode()).hexdigest()
+
+
+def open_output(output_folder, filename, system_prompt, task_keys):
+    # Rows stream into <output>.partial.csv as tasks complete, and a rerun resumes where it stopped.
+    # A dry run only reads the checkpoint, so it never discards the progress of a real job.
+    stem = os.path.splitext(filename)[0]
+    if NUM_SHARDS > 1:
+        stem = f"{stem}.shard-{SHARD_INDEX}-of-{NUM_SHARDS}"
+    return StreamingWriter(os.path.join(output_folder, stem), task_fingerprint(system_prompt, task_keys),
+                           CHECKPOINT_INTERVAL, read_only=DRY_RUN)
+
+
+def write_output(writer, output_folder, filename, key_columns, num_tasks):
+    # Rows carry the task_index of the unit of work they belong to. Once all tasks are done, an
+    # unsharded run writes the final CSV; a shard writes its rows plus a manifest of the task
+    # indices it was responsible for.
+    df = writer.rows()
+    if NUM_SHARDS == 1:
+        df.drop(columns="task_index", errors="ignore").to_csv(os.path.join(output_folder, filename), index=False)
+        writer.discard()
+        return
+    stem = f"{os.path.splitext(filename)[0]}.shard-{SHARD_INDEX}-of-{NUM_SHARDS}"
+    if df.empty:
+        df = pd.DataFrame(columns=["task_index"])
+    df.to_csv(os.path.join(output_folder, f"{stem}.csv"), index=False)
+    manifest = {
+        "output": filename,
+        "csv": f"{stem}.csv",
+        "num_shards": NUM_SHARDS,
+        "shard_index": SHARD_INDEX,
+        "num_tasks": num_tasks,
+        "fingerprint": writer.fingerprint,
+        "key_columns": key_columns,
+        "task_indices": sorted(int(i) for i in writer.completed),
+    }
+    with open(os.path.join(output_folder, f"{stem}.json"), "w") as f:
+        json.dump(manifest, f)
+    print(f"Wrote shard {SHARD_INDEX} of {NUM_SHARDS}: {len(df)} rows for {len(writer.completed)}/{num_tasks} tasks "
+          f"to {stem}.csv")
+    writer.discard()
+
+
+def merge_shards(input_folder, output_folder):
+    manifests = {}
+    for path in sorted(glob.glob(os.path.join(input_folder, "*.shard-*-of-*.json"))):
+        if not re.search(r"\.shard-\d+-of-\d+\.json$", path):
+            continue  # Checkpoints of shards still running
+        with open(path) as f:
+            manifest = json.load(f)
+        manifests.setdefault(manifest["output"], []).append(manifest)
+    if not manifests:
+        raise ValueError(f"No shard manifests found in {input_folder}")
+
+    for filename, shards in sorted(manifests.items()):
+        shards = sorted(shards, key=lambda m: m["shard_index"])
+        problems = []
+        num_shards, num_tasks = shards[0]["num_shards"], shards[0]["num_tasks"]
+        if any((m["num_shards"], m["num_tasks"], m["fingerprint"]) != (num_shards, num_tasks, shards[0]["fingerprint"])
+               for m in shards):
+            problems.append("shards were run on different task lists or settings")
+        missing_shards = sorted(set(range(num_shards)) - {m["shard_index"] for m in shards})
+        if missing_shards:
+            problems.append(f"missing shards {missing_shards}")
+
+        owners = np.zeros(num_tasks, dtype=int)
+        frames = []
+        for m in shards:
+            owners[m["task_indices"]] += 1
+            df = pd.read_csv(os.path.join(input_folder, m["csv"]), dtype=str, keep_default_na=False)
+            df["task_index"] = df["task_index"].astype(int)
+            stray = sorted(set(df["task_index"]) - set(m["task_indices"]))
+            if stray:
+                problems.append(f"shard {m['shard_index']} has rows for tasks it does not own: {stray[:10]}")
+            frames.append(df)
+        missing, duplicated = np.flatnonzero(owners == 0), np.flatnonzero(owners > 1)
+        if len(missing):
+            problems.append(f"{len(missing)} tasks not covered by any shard, e.g. {missing[:10].tolist()}")
+        if len(duplicated):
+            problems.append(f"{len(duplicated)} tasks covered by several shards, e.g. {duplicated[:10].tolist()}")
+        merged = pd.concat(frames, ignore_index=True)
+        duplicate_rows = merged[merged.duplicated(subset=shards[0]["key_columns"], keep=False)]
+        if len(duplicate_rows):
+            problems.append(f"{len(duplicate_rows)} rows share a key:\n"
+                            f"{duplicate_rows[shards[0]['key_columns']].head(10).to_string(index=False)}")
+        if problems:
+            raise ValueError(f"Cannot merge {filename}:\n- " + "\n- ".join(problems))
+
+        # Shards keep task order within themselves, so a stable sort restores the unsharded order
+        merged = merged.sort_values("task_index", kind="stable").drop(columns="task_index")
+        merged.to_csv(os.path.join(output_folder, filename), index=False)
+        print(f"Merged {num_shards} shards into {filename}: {len(merged)} rows for {num_tasks} tasks")
+
+
+def canonical_text(text):
+    # Case, Unicode form, punctuation and whitespace differences do not change a judge decision
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
 
 
 # ── Pydantic schemas ─────────────────────────────────────────────────────────
@@ -57,6 +678,16 @@ class QuestionAssessment(BaseModel):
     assessment_decision: Literal["very-similar", "similar", "different", "very-different"]
 
 
+class CandidateQuestionAssessment(BaseModel):
+    candidate_rank: int
+    rationale: str
+    assessment_decision: Literal["very-similar", "similar", "different", "very-different"]
+
+
+class QuestionAssessments(BaseModel):
+    assessments: list[CandidateQuestionAssessment]
+
+
 class ReportAnswerAssessment(BaseModel):
     answer_id: str
     rationale: str
@@ -78,13 +709,13 @@ def load_articles():
     return articles
 
 
+def index_cache_dir():
+    # Parsed runs and rubrics are cached next to the data they come from, so --data_dir keeps them apart
+    return os.path.join(DATA_DIR, CACHE_FOLDER)
+
+
 def load_rubrics():
-    rubrics = {}
-    for path in sorted(glob.glob(os.path.join(DATA_DIR, "human_rubrics", "*.json"))):
-        with open(path) as f:
-            data = json.load(f)
-        rubrics[data["topic_id"]] = data["rubrics"]
-    return rubrics
+    return load_rubric_index(os.path.join(DATA_DIR, "human_rubrics"), index_cache_dir())
 
 
 # ── Task: auto_compound_question_check ────────────────────────────────────────────
@@ -92,110 +723,277 @@ def load_rubrics():
 def run_auto_compound_question_check(input_folder, output_folder):
     system_prompt = open(os.path.join(SCRIPT_DIR, "system_prompts", "compound_question_check.txt")).read()
 
-    rows = []
-    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
-        df = pd.read_csv(path, sep="\t", header=None,
-                         names=["topic_id", "team", "run_tag", "run_question_rank", "run_question_text"])
-        df["run_tag"] = os.path.basename(path)
-        rows.append(df)
-    questions = pd.concat(rows, ignore_index=True)
-
-    outputs = []
-    for _, row in tqdm(questions.iterrows(), total=len(questions), desc="auto_compound_question_check"):
-        user_input = (f"Question: {row['run_question_text']}\n"
-                      f"Check if this question is a compound question. Reason first and then decide.")
-        reasoning, content = call_llm(system_prompt, user_input, CompoundAssessment.model_json_schema())
-        result = CompoundAssessment.model_validate_json(content)
-        outputs.append({
-            "topic_id": row["topic_id"],
-            "run_tag": row["run_tag"],
-            "run_question_rank": row["run_question_rank"],
-            "run_question_text": row["run_question_text"],
+    questions = [r for records in load_question_runs(input_folder, index_cache_dir()).values() for r in records]
+
+    user_inputs = [
+        f"Question: {r.run_question_text}\n"
+        f"Check if this question is a compound question. Reason first and then decide."
+        for r in questions
+    ]
+    task_meta = [{"topic_id": r.topic_id, "run_tag": r.run_tag, "run_question_rank": r.run_question_rank}
+                 for r in questions]
+    task_keys = [(r.topic_id, r.run_tag, r.run_question_rank) for r in questions]
+
+    def on_result(i, result, columns):
+        r = questions[i]
+        writer.write([i], [{
+            "task_index": i,
+            "topic_id": r.topic_id,
+            "run_tag": r.run_tag,
+            "run_question_rank": r.run_question_rank,
+            "run_question_text": r.run_question_text,
             "auto_compound_question_assessment": result.assessment_decision,
             "auto_assessment_rationale": result.rationale,
-        })
+            **columns,
+        }])
 
-    pd.DataFrame(outputs).to_csv(os.path.join(output_folder, "auto_compound_question_check.csv"), index=False)
+    with open_output(output_folder, "auto_compound_question_check.csv", system_prompt, task_keys) as writer:
+        dedup_keys = [canonical_text(r.run_question_text) for r in questions] if DEDUP else None
+        results = run_llm_tasks(system_prompt, user_inputs, CompoundAssessment, desc="auto_compound_question_check",
+                                task_meta=task_meta, on_result=on_result, skip=writer.completed, dedup_keys=dedup_keys)
+        if results is None:
+            return
+        write_output(writer, output_folder, "auto_compound_question_check.csv",
+                     key_columns=["topic_id", "run_tag", "run_question_rank"], num_tasks=len(task_keys))
 
 
 # ── Task: auto_question_evaluation ───────────────────────────────────────────
 
-def run_auto_question_evaluation(input_folder, output_folder):
-    system_prompt = open(os.path.join(SCRIPT_DIR, "system_prompts", "question_judge.txt")).read()
+def run_auto_question_evaluation(input_folder, output_folder, judge_mode="pair", compound_check_input=None):
+    # judge_mode "pair" judges one candidate per call; "batch" judges all candidates of a run
+    # against a rubric question in a single call. If a compound check CSV is given, questions
+    # labeled compound are not judged, since score.py zeroes their scores anyway.
+    prompt_file = "question_judge_batch.txt" if judge_mode == "batch" else "question_judge.txt"
+    system_prompt = open(os.path.join(SCRIPT_DIR, "system_prompts", prompt_file)).read()
     articles = load_articles()
     rubrics = load_rubrics()
     human_assessments = pd.read_csv(os.path.join(DATA_DIR, "human_assessments", "question_assessments.csv"))
 
-    # Load participant questions
-    rows = []
-    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
-        df = pd.read_csv(path, sep="\t", header=None,
-                         names=["topic_id", "team", "run_tag", "run_question_rank", "run_question_text"])
-        df["run_tag"] = os.path.basename(path)
-        rows.append(df)
-    all_questions = pd.concat(rows, ignore_index=True)
+    question_index = load_question_runs(input_folder, index_cache_dir())
 
     # Build few-shot examples from organizer baselines with human assessments
-    example_questions = all_questions[all_questions["run_tag"].isin(question_organizer_runs)].copy()
+    organizer_assessments = human_assessments[human_assessments["run_tag"].isin(question_organizer_runs)]
+    labels = {}
+    for topic_id, rq_rank, run_tag, run_q_rank, text, annotation in organizer_assessments[
+        ["topic_id", "rubric_question_rank", "run_tag", "run_question_rank", "run_question_text", "annotation"]
+    ].itertuples(index=False, name=None):
+        labels.setdefault((topic_id, rq_rank), {}).setdefault((run_tag, run_q_rank, text), []).append(annotation)
     examples = {}
     for topic_id in sorted(human_assessments["topic_id"].unique()):
-        topic_assessments = human_assessments[
-            (human_assessments["topic_id"] == topic_id) &
-            (human_assessments["run_tag"].isin(question_organizer_runs))
-        ]
-        topic_questions = example_questions[example_questions["topic_id"] == topic_id]
-        for rq_rank in sorted(topic_assessments["rubric_question_rank"].unique()):
-            part = topic_assessments[topic_assessments["rubric_question_rank"] == rq_rank]
-            merged = pd.merge(topic_questions, part,
-                              on=["topic_id", "run_tag", "run_question_rank", "run_question_text"], how="left")
-            merged["annotation"] = merged["annotation"].fillna("very-different")
+        topic_questions = [r for run_tag in sorted(question_organizer_runs)
+                           for r in question_index.get((topic_id, run_tag), [])]
+        for rq_rank in sorted(rq for t, rq in labels if t == topic_id):
+            rq_labels = labels[(topic_id, rq_rank)]
             examples[(topic_id, rq_rank)] = [
-                {r["run_question_text"]: r["annotation"]} for _, r in merged.iterrows()
+                {r.run_question_text: annotation}
+                for r in topic_questions
+                for annotation in rq_labels.get((r.run_tag, r.run_question_rank, r.run_question_text),
+                                                ["very-different"])
             ]
 
     # Build and process tasks
-    participant_runs = sorted(set(all_questions["run_tag"].unique()) - set(question_organizer_runs))
-    outputs = []
+    participant_runs = sorted({run_tag for _, run_tag in question_index} - set(question_organizer_runs))
+    ranked = {key: sorted(records, key=lambda r: r.run_question_rank) for key, records in question_index.items()}
     tasks = []
     for topic_id, topic_rubrics in sorted(rubrics.items()):
         for question in topic_rubrics:
             rq_rank = int(question["question_id"].split("-")[-1])
             rq_text = question["question_text"]
             for run_tag in participant_runs:
-                part = all_questions[
-                    (all_questions["topic_id"] == topic_id) & (all_questions["run_tag"] == run_tag)
-                ].sort_values("run_question_rank")
-                for _, row in part.iterrows():
-                    tasks.append((topic_id, rq_rank, rq_text, run_tag, row["run_question_rank"],
-                                  row["run_question_text"]))
-
-    for topic_id, rq_rank, rq_text, run_tag, run_q_rank, candidate in tqdm(tasks, desc="auto_question_evaluation"):
-        user_input = (
-            f"Below is the news article:\n\n"
-            f"{json.dumps(articles[topic_id], ensure_ascii=False, indent=2)}\n\n"
-            f"This is the target question: {rq_text}\n\n"
-            f"Below are some example candidate questions with assessments:\n\n"
-            f"{json.dumps(examples[(topic_id, rq_rank)], ensure_ascii=False, indent=2)}\n\n"
-            f"Assess the following candidate question:\n\n"
-            f'{json.dumps({"candidate_question": candidate}, ensure_ascii=False, indent=2)}\n\n'
+                for r in ranked.get((topic_id, run_tag), []):
+                    tasks.append((topic_id, rq_rank, rq_text, run_tag, r.run_question_rank, r.run_question_text))
+
+    compound_keys = set()
+    if compound_check_input is not None:
+        compound = pd.read_csv(compound_check_input)
+        compound = compound[compound["auto_compound_question_assessment"] == "compound"]
+        compound_keys = set(zip(compound["topic_id"], compound["run_tag"], compound["run_question_rank"].astype(int)))
+    # Pairs that are not sent to the judge: {pair index: (reason, rationale)}
+    not_judged = {}
+    for i, t in enumerate(tasks):
+        if (t[0], t[3], t[4]) in compound_keys:
+            not_judged[i] = ("compound", "Not judged: the candidate question was labeled compound by "
+                                         "auto_compound_question_check.")
+    if compound_keys:
+        print(f"auto_question_evaluation: skipping {len(not_judged)}/{len(tasks)} "
+              f"pairs with compound candidate questions")
+    if PREFILTER_THRESHOLD is not None:
+        remaining = [i for i in range(len(tasks)) if i not in not_judged]
+        similarities = pair_similarities([(tasks[i][0], tasks[i][2], tasks[i][5]) for i in remaining], articles,
+                                         PREFILTER_METHOD, PREFILTER_MODEL_PATH)
+        for i, similarity in zip(remaining, similarities):
+            if similarity < PREFILTER_THRESHOLD:
+                not_judged[i] = ("prefilter", f"Not judged: {PREFILTER_METHOD} similarity {similarity:.4f} to the "
+                                              f"target question is below the prefilter threshold "
+                                              f"{PREFILTER_THRESHOLD}.")
+        print(f"auto_question_evaluation: prefilter labeled "
+              f"{sum(reason == 'prefilter' for reason, _ in not_judged.values())}/{len(remaining)} "
+              f"pairs very-different without a judge call")
+    pair_indices = [i for i in range(len(tasks)) if i not in not_judged]
+    judged_tasks = [tasks[i] for i in pair_indices]
+
+    # Output rows are indexed by pair, whether judged alone, in a batch or not at all
+    task_keys = [(t[0], t[1], t[3], t[4], not_judged.get(i, ("judge",))[0]) for i, t in enumerate(tasks)]
+    with open_output(output_folder, "auto_question_assessments.csv", system_prompt, task_keys) as writer:
+        # Emit a placeholder row for every pair that is not judged so score.py still sees complete
+        # data; when sharded, the first shard writes all of them
+        placeholders = [i for i in sorted(not_judged) if i not in writer.completed]
+        if placeholders and SHARD_INDEX == 0 and not DRY_RUN:
+            writer.write(placeholders, [question_output_row(i, tasks[i], "very-different", not_judged[i][1])
+                                        for i in placeholders])
+
+        judge = judge_question_batches if judge_mode == "batch" else judge_question_pairs
+        if not judge(system_prompt, judged_tasks, pair_indices, articles, examples, writer):
+            return
+        write_output(writer, output_folder, "auto_question_assessments.csv",
+                     key_columns=["topic_id", "rubric_question_rank", "run_tag", "run_question_rank"],
+                     num_tasks=len(task_keys))
+
+
+def question_output_row(pair_index, task, decision, rationale, columns=None):
+    topic_id, rq_rank, rq_text, run_tag, run_q_rank, candidate = task
+    return {
+        "task_index": pair_index,
+        "topic_id": topic_id,
+        "rubric_question_rank": rq_rank,
+        "run_tag": run_tag,
+        "run_question_rank": run_q_rank,
+        "auto_assessment": decision,
+        "auto_rationale": rationale,
+        **(columns if columns is not None else cascade_columns()),
+    }
+
+
+def question_prompt_prefix(article, rq_text, rq_examples):
+    # Everything that is shared by all candidates of a (topic, rubric question) comes first
+    selected = select_question_examples(rq_examples)
+    prefix = (
+        f"Below is the news article:\n\n"
+        f"{to_prompt_json(prompt_article(article))}\n\n"
+        f"This is the target question: {rq_text}\n\n"
+    )
+    if selected:
+        prefix += f"Below are some example candidate questions with assessments:\n\n{to_prompt_json(selected)}\n\n"
+    return prefix
+
+
+def judge_question_pairs(system_prompt, tasks, pair_indices, articles, examples, writer):
+    # Streams one row per judged pair to `writer`; returns False on a dry run
+    prefix_of = {}
+    prefixes, user_inputs = [], []
+    for topic_id, rq_rank, rq_text, run_tag, run_q_rank, candidate in tasks:
+        if (topic_id, rq_rank) not in prefix_of:
+            prefix_of[(topic_id, rq_rank)] = (
+                question_prompt_prefix(articles[topic_id], rq_text, examples[(topic_id, rq_rank)]) +
+                "Assess the following candidate question:\n\n"
+            )
+        prefix = prefix_of[(topic_id, rq_rank)]
+        prefixes.append(prefix)
+        user_inputs.append(
+            prefix +
+            f'{to_prompt_json({"candidate_question": candidate})}\n\n'
             f"Provide your reasoning in a rationale field and your decision in an assessment_decision field."
         )
-        reasoning, content = call_llm(system_prompt, user_input, QuestionAssessment.model_json_schema())
-        result = QuestionAssessment.model_validate_json(content)
-        outputs.append({
-            "topic_id": topic_id,
-            "rubric_question_rank": rq_rank,
-            "run_tag": run_tag,
-            "run_question_rank": run_q_rank,
-            "auto_assessment": result.assessment_decision,
-            "auto_rationale": result.rationale,
-        })
+    task_meta = [{"topic_id": t[0], "rubric_question_rank": t[1], "run_tag": t[3], "run_question_rank": t[4]}
+                 for t in tasks]
+
+    def on_result(j, result, columns):
+        i = pair_indices[j]
+        writer.write([i], [question_output_row(i, tasks[j], result.assessment_decision, result.rationale, columns)])
+
+    done = {j for j, i in enumerate(pair_indices) if i in writer.completed}
+    dedup_keys = [(t[0], t[1], canonical_text(t[5])) for t in tasks] if DEDUP else None
+    results = run_llm_tasks(system_prompt, user_inputs, QuestionAssessment, desc="auto_question_evaluation",
+                            prefixes=prefixes, task_meta=task_meta, on_result=on_result, skip=done,
+                            dedup_keys=dedup_keys)
+    return results is not None
+
+
+def judge_question_batches(system_prompt, tasks, pair_indices, articles, examples, writer):
+    # Tasks are ordered by (topic, rubric question, run), so each group is one run's candidate list
+    batches, batch_pairs = [], []
+    for _, group in itertools.groupby(zip(pair_indices, tasks), key=lambda p: (p[1][0], p[1][1], p[1][3])):
+        group = list(group)
+        batch_pairs.append([i for i, _ in group])
+        batches.append([t for _, t in group])
+
+    prefix_of = {}
+    prefixes, user_inputs = [], []
+    for batch in batches:
+        topic_id, rq_rank, rq_text = batch[0][:3]
+        if (topic_id, rq_rank) not in prefix_of:
+            prefix_of[(topic_id, rq_rank)] = (
+                question_prompt_prefix(articles[topic_id], rq_text, examples[(topic_id, rq_rank)]) +
+                "Assess each of the following candidate questions against the target question:\n\n"
+            )
+        prefix = prefix_of[(topic_id, rq_rank)]
+        candidates = [{"candidate_rank": int(t[4]), "candidate_question": t[5]} for t in batch]
+        prefixes.append(prefix)
+        user_inputs.append(
+            prefix +
+            f"{to_prompt_json(candidates)}\n\n"
+            f"For every candidate, provide its candidate_rank, your reasoning in a rationale field and your "
+            f"decision in an assessment_decision field."
+        )
+
+    def validate(i, result):
+        topic_id, rq_rank, _, run_tag = batches[i][0][:4]
+        expected = sorted(int(t[4]) for t in batches[i])
+        returned = sorted(a.candidate_rank for a in result.assessments)
+        if returned != expected:
+            raise ValueError(f"{topic_id} / rubric question {rq_rank} / {run_tag}: "
+                             f"returned candidate ranks {returned}, expected {expected}")
+
+    task_meta = [{"topic_id": b[0][0], "rubric_question_rank": b[0][1], "run_tag": b[0][3], "num_candidates": len(b)}
+                 for b in batches]
 
-    pd.DataFrame(outputs).to_csv(os.path.join(output_folder, "auto_question_assessments.csv"), index=False)
+    def on_result(b, result, columns):
+        by_rank = {a.candidate_rank: a for a in result.assessments}
+        rows = []
+        for i, task in zip(batch_pairs[b], batches[b]):
+            a = by_rank[int(task[4])]
+            rows.append(question_output_row(i, task, a.assessment_decision, a.rationale, columns))
+        writer.write(batch_pairs[b], rows)
+
+    done = {b for b, pairs in enumerate(batch_pairs) if all(i in writer.completed for i in pairs)}
+    dedup_keys = None
+    if DEDUP:
+        # Only whole candidate lists are shared, ranks included, since results are matched by candidate rank
+        dedup_keys = [(b[0][0], b[0][1], tuple((int(t[4]), canonical_text(t[5])) for t in b)) for b in batches]
+    results = run_llm_tasks(system_prompt, user_inputs, QuestionAssessments, desc="auto_question_evaluation",
+                            schema_name="assessments", validate=validate, prefixes=prefixes, task_meta=task_meta,
+                            on_result=on_result, skip=done, dedup_keys=dedup_keys)
+    return results is not None
 
 
 # ── Task: auto_report_evaluation ─────────────────────────────────────────────
 
+def report_prompt_prefix(article, topic_rubrics, examples, topic_id):
+    # Article, rubric and example reports are the same for every report of a topic
+    example_strs = []
+    for i, org_run in enumerate(report_organizer_runs[:MAX_REPORT_EXAMPLES], 1):
+        example_strs.append(
+            f"Example {i}:\n\n"
+            f"{to_prompt_json(examples[(topic_id, org_run)])}"
+        )
+    prefix = (
+        f"Below is the news article:\n\n"
+        f"{to_prompt_json(prompt_article(article))}\n\n"
+        f"Below is the rubric used to assess reports:\n\n"
+        f"{to_prompt_json(topic_rubrics)}\n\n"
+    )
+    # With --max_report_examples 0 the examples section is left out, heading included
+    if example_strs:
+        prefix += f"Below are example reports and their assessments:\n\n{chr(10).join(example_strs)}\n\n"
+    return (
+        prefix +
+        f"Below is the report you need to assess, based on the rubric above"
+        f"{' and given examples' if example_strs else ''}. "
+        f"Assess whether this report supports, partially supports (partial), contradicts, "
+        f"or has no relation (none) to each short answer in the rubric.\n\n"
+    )
+
+
 def run_auto_report_evaluation(input_folder, output_folder):
     system_prompt = open(os.path.join(SCRIPT_DIR, "system_prompts", "report_judge.txt")).read()
     articles = load_articles()
@@ -208,70 +1006,56 @@ def run_auto_report_evaluation(input_folder, output_folder):
             for a in q["short_answers"]:
                 a.pop("references", None)
 
-    # Load participant reports
-    reports = []
-    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
-        run_tag = os.path.basename(path)
-        with open(path) as f:
-            for line in f:
-                data = json.loads(line)
-                topic_id = data["metadata"]["topic_id"]
-                report_text = " ".join(s["text"] for s in data["responses"])
-                reports.append({"topic_id": topic_id, "run_tag": run_tag, "report": report_text})
-    reports = pd.DataFrame(reports)
+    report_index = load_report_runs(input_folder, index_cache_dir())
 
     # Build few-shot examples from organizer baselines with human assessments
+    organizer_assessments = {
+        key: group for key, group in human_assessments[human_assessments["run_tag"].isin(report_organizer_runs)]
+        .groupby(["topic_id", "run_tag"])
+    }
     examples = {}
     for topic_id in sorted(human_assessments["topic_id"].unique()):
         for org_run in report_organizer_runs:
-            report_text = reports[
-                (reports["topic_id"] == topic_id) & (reports["run_tag"] == org_run)
-            ]["report"].values[0]
-            assessments = human_assessments[
-                (human_assessments["topic_id"] == topic_id) & (human_assessments["run_tag"] == org_run)
-            ].sort_values(by="answer_id", key=lambda x: x.str.extract(r"(\d+)$")[0].astype(int))
-            assessments_dict = {r["answer_id"]: r["annotation"] for _, r in assessments.iterrows()}
-            examples[(topic_id, org_run)] = {"report": report_text, "assessments": assessments_dict}
+            report_text = report_index[(topic_id, org_run)].report
+            assessments = organizer_assessments.get((topic_id, org_run), human_assessments.iloc[:0])
+            assessments = sorted(zip(assessments["answer_id"], assessments["annotation"]),
+                                 key=lambda a: int(re.search(r"(\d+)$", a[0]).group(1)))
+            examples[(topic_id, org_run)] = {"report": report_text, "assessments": dict(assessments)}
 
     # Process non-organizer reports
-    participant_reports = reports[~reports["run_tag"].isin(report_organizer_runs)].sort_values("topic_id")
+    participant_reports = [report_index[key] for key in sorted(report_index)
+                           if key[1] not in report_organizer_runs]
 
-    outputs = []
-    for _, row in tqdm(participant_reports.iterrows(), total=len(participant_reports), desc="auto_report_evaluation"):
-        topic_id, run_tag, report_text = row["topic_id"], row["run_tag"], row["report"]
+    prefix_of = {}
+    prefixes, user_inputs = [], []
+    for topic_id, run_tag, report_text in participant_reports:
+        if topic_id not in prefix_of:
+            prefix_of[topic_id] = report_prompt_prefix(articles[topic_id], rubrics[topic_id], examples, topic_id)
+        prefixes.append(prefix_of[topic_id])
+        user_inputs.append(prefix_of[topic_id] + f"{to_prompt_json(report_text)}\n\n")
+    task_meta = [{"topic_id": topic_id, "run_tag": run_tag} for topic_id, run_tag, _ in participant_reports]
+    task_keys = [(topic_id, run_tag) for topic_id, run_tag, _ in participant_reports]
 
-        example_strs = []
-        for i, org_run in enumerate(report_organizer_runs, 1):
-            example_strs.append(
-                f"Example {i}:\n\n"
-                f"{json.dumps(examples[(topic_id, org_run)], ensure_ascii=False, indent=2)}"
-            )
-
-        user_input = (
-            f"Below is the news article:\n\n"
-            f"{json.dumps(articles[topic_id], ensure_ascii=False, indent=2)}\n\n"
-            f"Below is the rubric used to assess reports:\n\n"
-            f"{json.dumps(rubrics[topic_id], ensure_ascii=False, indent=2)}\n\n"
-            f"Below are example reports and their assessments:\n\n"
-            f"{chr(10).join(example_strs)}\n\n"
-            f"Below is the report you need to assess, based on the rubric above and given examples. "
-            f"Assess whether this report supports, partially supports (partial), contradicts, "
-            f"or has no relation (none) to each short answer in the rubric.\n\n"
-            f"{json.dumps(report_text, ensure_ascii=False, indent=2)}\n\n"
-        )
-        reasoning, content = call_llm(system_prompt, user_input,
-                                      ReportAssessments.model_json_schema(), schema_name="assessments")
-        result = ReportAssessments.model_validate_json(content)
-        for a in result.assessments:
-            outputs.append({
-                "topic_id": topic_id,
-                "run_tag": run_tag,
-                "answer_id": a.answer_id,
-                "auto_assessment": a.assessment_decision,
-                "auto_rationale": a.rationale,
-            })
+    def on_result(i, result, columns):
+        topic_id, run_tag, _ = participant_reports[i]
+        writer.write([i], [{
+            "task_index": i,
+            "topic_id": topic_id,
+            "run_tag": run_tag,
+            "answer_id": a.answer_id,
+            "auto_assessment": a.assessment_decision,
+            "auto_rationale": a.rationale,
+            **columns,
+        } for a in result.assessments])
 
-    pd.DataFrame(outputs).to_csv(os.path.join(output_folder, "auto_report_assessments.csv"), index=False)
+    with open_output(output_folder, "auto_report_assessments.csv", system_prompt, task_keys) as writer:
+        results = run_llm_tasks(system_prompt, user_inputs, ReportAssessments, desc="auto_report_evaluation",
+                                schema_name="assessments", prefixes=prefixes, task_meta=task_meta,
+                                on_result=on_result, skip=writer.completed)
+        if results is None:
+            return
+        write_output(writer, output_folder, "auto_report_assessments.csv",
+                     key_columns=["topic_id", "run_tag", "answer_id"], num_tasks=len(task_keys))
 
 
 # ── Main ─────────────────────────────────────────────────────────────────────
@@ -279,16 +1063,119 @@ def run_auto_report_evaluation(input_folder, output_folder):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="DRAGUN AutoJudge")
     parser.add_argument("--task", required=True,
-                        choices=["auto_compound_question_check", "auto_question_evaluation", "auto_report_evaluation"])
-    parser.add_argument("--input_folder_path", required=True, help="Folder containing run files")
+                        choices=["auto_compound_question_check", "auto_question_evaluation", "auto_question_pipeline",
+                                 "auto_report_evaluation", "merge_shards"])
+    parser.add_argument("--input_folder_path", required=True,
+                        help="Folder containing run files (merge_shards: folder containing the shard outputs)")
     parser.add_argument("--output_folder_path", required=True, help="Folder to write output CSVs")
+    parser.add_argument("--data_dir", default=DATA_DIR,
+                        help="Folder containing the topics, human rubrics and human assessments")
+    parser.add_argument("--base_urls", nargs="+", default=BASE_URLS,
+                        help="OpenAI-compatible endpoints of one or more vLLM replicas serving MODEL")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Max number of concurrent requests per judge server replica")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="Per-request timeout in seconds")
+    parser.add_argument("--max_retries", type=int, default=MAX_RETRIES,
+                        help="Retries per task on transport errors or invalid responses")
+    parser.add_argument("--question_judge_mode", choices=["pair", "batch"], default="pair",
+                        help="auto_question_evaluation: judge one candidate per call (pair) or all candidates "
+                             "of a run per call (batch)")
+    parser.add_argument("--compound_check_input", default=None,
+                        help="auto_question_evaluation: compound check CSV; compound questions are not judged")
+    parser.add_argument("--prefix_log", action="store_true",
+                        help="Write a per-request log of shared prompt prefix tokens to the output folder")
+    parser.add_argument("--prefix_warm_wait", type=float, default=PREFIX_WARM_WAIT,
+                        help="Seconds the rest of a prefix group waits after its leader's request is sent "
+                             "(negative: until the leader's response is back)")
+    parser.add_argument("--prompt_style", choices=["verbose", "compact"], default=PROMPT_STYLE,
+                        help="compact: JSON without whitespace, unused article fields dropped, "
+                             "duplicate examples removed")
+    parser.add_argument("--max_question_examples", type=int, default=MAX_QUESTION_EXAMPLES,
+                        help="Max few-shot example questions per rubric question (default: all)")
+    parser.add_argument("--max_report_examples", type=int, default=MAX_REPORT_EXAMPLES,
+                        help="Max organizer example reports per prompt (default: all)")
+    parser.add_argument("--token_report", action="store_true",
+                        help="Write per-task prompt token counts to <output_folder>/<task>_token_report.csv")
+    parser.add_argument("--dry_run", action="store_true",
+                        help="Only build prompts and write token reports; do not call the judge")
+    parser.add_argument("--prefilter_threshold", type=float, default=PREFILTER_THRESHOLD,
+                        help="auto_question_evaluation: label pairs less similar than this very-different without "
+                             "a judge call (calibrate with prefilter.py)")
+    parser.add_argument("--prefilter_method", choices=["tfidf", "embedding"], default=PREFILTER_METHOD)
+    parser.add_argument("--prefilter_model_path", default=PREFILTER_MODEL_PATH,
+                        help="Local sentence-transformers model for --prefilter_method embedding")
+    parser.add_argument("--no_dedup", action="store_true",
+                        help="Judge every copy of a candidate question, even if it repeats one already judged")
+    parser.add_argument("--num_shards", type=int, default=NUM_SHARDS,
+                        help="Split the task list into this many shards, balanced by estimated prompt tokens")
+    parser.add_argument("--shard_index", type=int, default=SHARD_INDEX, help="Shard to run (0-based)")
+    parser.add_argument("--cascade_model", default=CASCADE_MODEL,
+                        help="Cheap first-pass judge model; only answers below --cascade_threshold go to MODEL")
+    parser.add_argument("--cascade_base_urls", nargs="+", default=CASCADE_BASE_URLS,
+                        help="OpenAI-compatible endpoints serving --cascade_model (default: --base_urls)")
+    parser.add_argument("--cascade_confidence", choices=["logprobs", "consistency"], default=CASCADE_CONFIDENCE,
+                        help="First-pass confidence: decision token logprobs, or agreement of sampled answers")
+    parser.add_argument("--cascade_threshold", type=float, default=CASCADE_THRESHOLD,
+                        help="Escalate first-pass answers whose confidence is below this (0 keeps them all)")
+    parser.add_argument("--cascade_samples", type=int, default=CASCADE_SAMPLES,
+                        help="Samples per first-pass request with --cascade_confidence consistency")
+    parser.add_argument("--telemetry_log", default=TELEMETRY_PATH,
+                        help="Append a JSON line per judge request (tokens, queue wait, latency, retries) to this "
+                             "file; summarize it with telemetry.py")
+    parser.add_argument("--metrics_port", type=int, default=METRICS_PORT,
+                        help="Export live Prometheus metrics on this port (needs prometheus_client)")
+    parser.add_argument("--cache_path", default=CACHE_PATH, help="SQLite file used to cache LLM responses")
+    parser.add_argument("--no_cache", action="store_true", help="Disable the LLM response cache")
     args = parser.parse_args()
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error("--shard_index must be between 0 and --num_shards - 1")
+    if args.num_shards > 1 and args.task == "auto_question_pipeline":
+        parser.error("auto_question_pipeline cannot be sharded: run auto_compound_question_check on every shard, "
+                     "merge_shards, then auto_question_evaluation with --compound_check_input")
+
+    DATA_DIR = args.data_dir
+    BASE_URLS = args.base_urls
+    CONCURRENCY = args.concurrency
+    REQUEST_TIMEOUT = args.timeout
+    MAX_RETRIES = args.max_retries
+    CACHE_PATH = None if args.no_cache else args.cache_path
+    PREFIX_LOG_DIR = args.output_folder_path if args.prefix_log else None
+    PREFIX_WARM_WAIT = None if args.prefix_warm_wait < 0 else args.prefix_warm_wait
+    PROMPT_STYLE = args.prompt_style
+    MAX_QUESTION_EXAMPLES = args.max_question_examples
+    MAX_REPORT_EXAMPLES = args.max_report_examples
+    DRY_RUN = args.dry_run
+    TOKEN_REPORT_DIR = args.output_folder_path if args.token_report or args.dry_run else None
+    PREFILTER_THRESHOLD = args.prefilter_threshold
+    PREFILTER_METHOD = args.prefilter_method
+    PREFILTER_MODEL_PATH = args.prefilter_model_path
+    DEDUP = not args.no_dedup
+    NUM_SHARDS = args.num_shards
+    SHARD_INDEX = args.shard_index
+    CASCADE_MODEL = args.cascade_model
+    CASCADE_BASE_URLS = args.cascade_base_urls
+    CASCADE_CONFIDENCE = args.cascade_confidence
+    CASCADE_THRESHOLD = args.cascade_threshold
+    CASCADE_SAMPLES = args.cascade_samples
+    TELEMETRY_PATH = args.telemetry_log
+    METRICS_PORT = args.metrics_port
 
     os.makedirs(args.output_folder_path, exist_ok=True)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
 
     if args.task == "auto_compound_question_check":
         run_auto_compound_question_check(args.input_folder_path, args.output_folder_path)
     elif args.task == "auto_question_evaluation":
-        run_auto_question_evaluation(args.input_folder_path, args.output_folder_path)
+        run_auto_question_evaluation(args.input_folder_path, args.output_folder_path, args.question_judge_mode,
+                                     args.compound_check_input)
+    elif args.task == "auto_question_pipeline":
+        # Compound check first, then question evaluation gated by its output
+        run_auto_compound_question_check(args.input_folder_path, args.output_folder_path)
+        compound_check_path = os.path.join(args.output_folder_path, "auto_compound_question_check.csv")
+        run_auto_question_evaluation(args.input_folder_path, args.output_folder_path, args.question_judge_mode,
+                                     None if DRY_RUN else compound_check_path)
     elif args.task == "auto_report_evaluation":
         run_auto_report_evaluation(args.input_folder_path, args.output_folder_path)
+    elif args.task == "merge_shards":
+        merge_shards(args.input_folder_path, args.output_folder_path)
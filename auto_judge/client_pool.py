@@ -0,0 +1,82 @@
+import time
+import openai
+import asyncio
+
+
+# Errors worth retrying on another attempt or replica; 4xx request errors are not
+TRANSPORT_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError,
+                    openai.RateLimitError)
+
+
+class Endpoint:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.client = openai.AsyncOpenAI(base_url=base_url, api_key="EMPTY", timeout=timeout, max_retries=0)
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # Circuit breaker: 0 when closed, else no new requests before this time
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now):
+        if not self.open_until:
+            return True
+        # Half-open after the cooldown: a single probe request decides whether the circuit closes
+        return self.open_until <= now and self.outstanding == 0
+
+
+# ── Client pool ──────────────────────────────────────────────────────────────
+
+class ClientPool:
+    # Least-outstanding-requests balancing over vLLM replicas. A replica that fails
+    # `failure_threshold` times in a row is taken out of rotation for `cooldown` seconds, then
+    # gets one probe request: success puts it back in rotation, failure opens it again.
+
+    def __init__(self, base_urls, timeout=600.0, failure_threshold=3, cooldown=30.0, affinity_slack=8):
+        self.endpoints = [Endpoint(url, timeout) for url in base_urls]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.affinity_slack = affinity_slack
+        self.affinity = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
+
+    async def acquire(self, affinity_key=None):
+        # Requests sharing an affinity key (a prompt prefix) stick to one replica so they hit its
+        # prefix cache, unless that replica is unhealthy or much busier than the least loaded one
+        while True:
+            now = time.monotonic()
+            healthy = [e for e in self.endpoints if e.available(now)]
+            if healthy:
+                break
+            await asyncio.sleep(max(min(e.open_until for e in self.endpoints) - now, 0.1))
+        # A replica that fails fast has no outstanding requests, so break ties by recent failures
+        least = min(healthy, key=lambda e: (e.outstanding, e.consecutive_failures))
+        endpoint = self.affinity.get(affinity_key)
+        if endpoint not in healthy or endpoint.outstanding > least.outstanding + self.affinity_slack:
+            endpoint = least
+        if affinity_key is not None:
+            self.affinity[affinity_key] = endpoint
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def release(self, endpoint, transport_error=False):
+        endpoint.outstanding -= 1
+        if not transport_error:
+            endpoint.consecutive_failures = 0
+            endpoint.open_until = 0.0
+            return
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.failure_threshold and endpoint.open_until <= time.monotonic():
+            endpoint.open_until = time.monotonic() + self.cooldown
+            print(f"Circuit open for {endpoint.base_url} after {endpoint.consecutive_failures} consecutive failures")
+
+    def summary(self):
+        return ", ".join(f"{e.base_url}: {e.requests} requests, {e.failures} failures" for e in self.endpoints)
@@ -0,0 +1,137 @@
+import os
+import glob
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(SCRIPT_DIR, "cache", "llm_cache.sqlite")
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(model, system_prompt, user_input, response_schema, schema_name):
+    payload = json.dumps([model, system_prompt, user_input, response_schema, schema_name],
+                         ensure_ascii=False, sort_keys=True)
+    return text_hash(payload)
+
+
+# ── On-disk response cache ───────────────────────────────────────────────────
+
+class LLMCache:
+    # Responses are keyed by a hash of everything that determines the model output, so any
+    # change to the model, prompt, input or schema is a cache miss rather than a stale hit.
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, prompt_hash TEXT, schema_name TEXT, "
+            "reasoning TEXT, content TEXT, created_at REAL, hit_count INTEGER DEFAULT 0, confidence REAL)"
+        )
+        # Caches created before first-pass confidences were stored lack the column
+        if "confidence" not in {row[1] for row in self.conn.execute("PRAGMA table_info(responses)")}:
+            self.conn.execute("ALTER TABLE responses ADD COLUMN confidence REAL")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        row = self.conn.execute("SELECT reasoning, content, confidence FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE responses SET hit_count = hit_count + 1 WHERE key = ?", (key,))
+        self.conn.commit()
+        return row
+
+    def put(self, key, model, system_prompt, schema_name, reasoning, content, confidence=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, model, prompt_hash, schema_name, reasoning, content, created_at, confidence) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, model, text_hash(system_prompt), schema_name, reasoning, content, time.time(), confidence),
+        )
+        self.conn.commit()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        self.conn.close()
+
+
+# ── Maintenance ──────────────────────────────────────────────────────────────
+
+def current_prompt_hashes():
+    hashes = {}
+    for path in sorted(glob.glob(os.path.join(SCRIPT_DIR, "system_prompts", "*.txt"))):
+        with open(path) as f:
+            hashes[text_hash(f.read())] = os.path.basename(path)
+    return hashes
+
+
+def print_stats(cache):
+    prompts = current_prompt_hashes()
+    rows = cache.conn.execute(
+        "SELECT model, prompt_hash, schema_name, COUNT(*), SUM(hit_count) FROM responses "
+        "GROUP BY model, prompt_hash, schema_name ORDER BY model, schema_name"
+    ).fetchall()
+    total_entries = sum(r[3] for r in rows)
+    total_hits = sum(r[4] or 0 for r in rows)
+    print(f"Cache: {cache.path}")
+    print(f"Entries: {total_entries}, lifetime hits: {total_hits}, "
+          f"hit rate: {total_hits / max(total_hits + total_entries, 1):.1%}")
+    for model, prompt_hash, schema_name, n, hits in rows:
+        prompt = prompts.get(prompt_hash, "stale prompt")
+        print(f"  {model}  {schema_name}  {prompt} ({prompt_hash[:12]}): {n} entries, {hits or 0} hits")
+
+
+def prune(cache, stale_prompts=False, model=None, older_than_days=None):
+    deleted = 0
+    if stale_prompts:
+        # Only system prompts are stored as files. An edited user prompt template in auto_judge.py changes
+        # every user input, so its old entries never hit again but are not detected here either.
+        current = list(current_prompt_hashes())
+        marks = ",".join("?" * len(current))
+        deleted += cache.conn.execute(
+            f"DELETE FROM responses WHERE prompt_hash NOT IN ({marks})", current).rowcount
+    if model is not None:
+        deleted += cache.conn.execute("DELETE FROM responses WHERE model != ?", (model,)).rowcount
+    if older_than_days is not None:
+        cutoff = time.time() - older_than_days * 86400
+        deleted += cache.conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+    cache.conn.commit()
+    cache.conn.execute("VACUUM")
+    print(f"Pruned {deleted} entries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DRAGUN AutoJudge LLM response cache")
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--cache_path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--stale_prompts", action="store_true",
+                        help="Prune entries whose system prompt no longer matches any file in system_prompts/ "
+                             "(edits to the user prompt templates in auto_judge.py are not detected)")
+    parser.add_argument("--model", default=None, help="Prune entries produced by any other model")
+    parser.add_argument("--older_than_days", type=float, default=None, help="Prune entries older than this")
+    args = parser.parse_args()
+
+    cache = LLMCache(args.cache_path)
+    if args.command == "stats":
+        print_stats(cache)
+    elif args.command == "prune":
+        prune(cache, args.stale_prompts, args.model, args.older_than_days)
+        print_stats(cache)
+    cache.close()
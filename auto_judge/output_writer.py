@@ -0,0 +1,128 @@
+import os
+import csv
+import json
+import time
+import pandas as pd
+
+
+# ── Streaming output writer ──────────────────────────────────────────────────
+
+class StreamingWriter:
+    # Appends the rows of each completed task to <stem>.partial.csv as soon as it finishes, and every
+    # `commit_interval` seconds fsyncs the file and records a checkpoint in <stem>.checkpoint.json: the
+    # tasks completed so far and the file size they account for. A restarted run with the same
+    # fingerprint truncates anything written after the last checkpoint and skips the completed tasks.
+    # A read-only writer (for dry runs) only reads the checkpoint and never changes or removes files.
+
+    def __init__(self, stem, fingerprint, commit_interval=10.0, read_only=False):
+        self.partial_path = f"{stem}.partial.csv"
+        self.checkpoint_path = f"{stem}.checkpoint.json"
+        self.fingerprint = fingerprint
+        self.commit_interval = commit_interval
+        self.read_only = read_only
+        self.completed = set()
+        self.fieldnames = None
+        self.file = None
+        self.writer = None
+        self.last_commit = time.monotonic()
+        self.resume()
+
+    def resume(self):
+        checkpoint = None
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        if (checkpoint is None or checkpoint["fingerprint"] != self.fingerprint or
+                not os.path.exists(self.partial_path) or
+                os.path.getsize(self.partial_path) < checkpoint["committed_bytes"]):
+            if self.read_only:
+                if os.path.exists(self.partial_path):
+                    print(f"Keeping {self.partial_path}: it does not match the current tasks and settings, "
+                          f"so a real run with them would start over")
+                return
+            if os.path.exists(self.partial_path):
+                print(f"Discarding {self.partial_path}: no checkpoint matching the current tasks and settings")
+            self.discard()
+            return
+        if not self.read_only:
+            with open(self.partial_path, "r+b") as f:
+                f.truncate(checkpoint["committed_bytes"])
+        with open(self.partial_path, newline="") as f:
+            self.fieldnames = next(csv.reader(f), None)
+        self.completed = set(checkpoint["completed_tasks"])
+        action = "A real run would resume from" if self.read_only else "Resuming from"
+        print(f"{action} {self.partial_path}: {len(self.completed)} tasks already completed")
+
+    def write(self, task_indices, rows):
+        # Rows of the given tasks are written together, so a checkpoint never covers half a task
+        if self.read_only:
+            raise RuntimeError(f"{self.partial_path} was opened read-only")
+        if self.file is None:
+            self.file = open(self.partial_path, "a", newline="")
+        if self.writer is None:
+            if self.fieldnames is None and rows:
+                self.fieldnames = list(rows[0])
+                csv.writer(self.file, lineterminator="\n").writerow(self.fieldnames)
+            if self.fieldnames is not None:
+                self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, lineterminator="\n")
+        if rows:
+            self.writer.writerows(rows)
+        self.file.flush()
+        self.completed.update(task_indices)
+        if time.monotonic() - self.last_commit >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        self.last_commit = time.monotonic()
+        committed_bytes = 0
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            committed_bytes = self.file.tell()
+        elif os.path.exists(self.partial_path):
+            committed_bytes = os.path.getsize(self.partial_path)
+        elif not self.completed:
+            return
+        checkpoint = {
+            "fingerprint": self.fingerprint,
+            "committed_bytes": committed_bytes,
+            "completed_tasks": sorted(int(i) for i in self.completed),
+            "updated_at": time.time(),
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        if self.file is not None:
+            self.commit()
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+    def rows(self):
+        # All rows written so far in task order; values are read back as the exact text written
+        self.close()
+        if not os.path.exists(self.partial_path) or os.path.getsize(self.partial_path) == 0:
+            return pd.DataFrame()
+        df = pd.read_csv(self.partial_path, dtype=str, keep_default_na=False)
+        return df.iloc[df["task_index"].astype(int).argsort(kind="stable")].reset_index(drop=True)
+
+    def discard(self):
+        if self.read_only:
+            return
+        for path in [self.partial_path, self.checkpoint_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.completed = set()
+        self.fieldnames = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # Keep everything completed so far if the run fails or is interrupted
+        self.close()
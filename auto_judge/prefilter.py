@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from run_index import load_rubric_index, CACHE_FOLDER  # noqa: E402
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional: only needed for the embedding method
+    SentenceTransformer = None
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(SCRIPT_DIR, "..", "data")
+POSITIVE_LABELS = ["very-similar", "similar"]  # Labels a filtered pair must not have
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be been by can could did do does for from had has have how if in into is it its "
+    "of on or should so than that the their there these they this those to was were what when where which "
+    "who whom whose why will with would".split()
+)
+
+
+# ── Pair similarity ──────────────────────────────────────────────────────────
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def tfidf_similarity(article, rubric_texts, candidate_texts):
+    # Cosine similarity of every rubric question to every candidate, shape (rubric, candidates).
+    # IDF comes from the article's sentences, so a term's weight does not depend on which runs are
+    # judged together and thresholds carry over from calibration.
+    docs = [tokenize(t) for t in list(rubric_texts) + list(candidate_texts)]
+    vocab = {}
+    for doc in docs:
+        for token in doc:
+            vocab.setdefault(token, len(vocab))
+    counts = np.zeros((len(docs), len(vocab)))
+    rows = np.repeat(np.arange(len(docs)), [len(doc) for doc in docs])
+    np.add.at(counts, (rows, [vocab[t] for doc in docs for t in doc]), 1)
+
+    sentences = SENTENCE_RE.split(f"{article.get('title', '')}. {article.get('body', '')}")
+    occurrences = {(s, vocab[t]) for s, sentence in enumerate(sentences) for t in tokenize(sentence) if t in vocab}
+    doc_freq = np.bincount([t for _, t in occurrences], minlength=len(vocab))
+    idf = np.log((1 + len(sentences)) / (1 + doc_freq)) + 1
+
+    weights = np.log1p(counts) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    weights = weights / np.where(norms == 0, 1, norms)
+    return weights[:len(rubric_texts)] @ weights[len(rubric_texts):].T
+
+
+def load_embedding_model(model_path):
+    if SentenceTransformer is None:
+        raise ImportError("The embedding prefilter needs sentence-transformers: pip install sentence-transformers")
+    return SentenceTransformer(model_path, device="cpu")
+
+
+def embedding_similarity(model, rubric_texts, candidate_texts):
+    embeddings = model.encode(list(rubric_texts) + list(candidate_texts), normalize_embeddings=True,
+                              convert_to_numpy=True, batch_size=64)
+    return embeddings[:len(rubric_texts)] @ embeddings[len(rubric_texts):].T
+
+
+def pair_similarities(pairs, articles, method="tfidf", model_path=None):
+    # pairs: [(topic_id, rubric question text, candidate question text)]; one similarity matrix per topic
+    model = load_embedding_model(model_path) if method == "embedding" else None
+    similarities = np.zeros(len(pairs))
+    by_topic = {}
+    for i, (topic_id, rubric_text, candidate_text) in enumerate(pairs):
+        by_topic.setdefault(topic_id, []).append(i)
+    for topic_id, indices in by_topic.items():
+        rubric_texts = list(dict.fromkeys(pairs[i][1] for i in indices))
+        candidate_texts = list(dict.fromkeys(pairs[i][2] for i in indices))
+        if method == "embedding":
+            matrix = embedding_similarity(model, rubric_texts, candidate_texts)
+        else:
+            matrix = tfidf_similarity(articles[topic_id], rubric_texts, candidate_texts)
+        rubric_pos = {t: k for k, t in enumerate(rubric_texts)}
+        candidate_pos = {t: k for k, t in enumerate(candidate_texts)}
+        rows = [rubric_pos[pairs[i][1]] for i in indices]
+        cols = [candidate_pos[pairs[i][2]] for i in indices]
+        similarities[indices] = matrix[rows, cols]
+    return similarities
+
+
+# ── Calibration ──────────────────────────────────────────────────────────────
+
+def wilson_upper(errors, n, z=1.645):
+    # One-sided 95% upper bound on an error rate observed as errors / n
+    if n == 0:
+        return float("nan")
+    p = errors / n
+    return (p + z * z / (2 * n) + z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n))) / (1 + z * z / n)
+
+
+def choose_threshold(similarities, positive, max_fnr):
+    # Largest threshold that filters (similarity < threshold) at most max_fnr of the positive pairs
+    positive_sims = np.sort(similarities[positive])
+    if len(positive_sims) == 0:
+        return 0.0
+    allowed = min(int(np.floor(max_fnr * len(positive_sims))), len(positive_sims) - 1)
+    return float(positive_sims[allowed])
+
+
+def calibrate(assessments, articles, rubrics, method="tfidf", model_path=None, targets=(0.0, 0.01, 0.02, 0.05, 0.1)):
+    rubric_text = {(topic_id, int(q["question_id"].split("-")[-1])): q["question_text"]
+                   for topic_id, topic_rubrics in rubrics.items() for q in topic_rubrics}
+    assessments = assessments[[(t, int(r)) in rubric_text for t, r in
+                               zip(assessments["topic_id"], assessments["rubric_question_rank"])]].copy()
+    pairs = list(zip(assessments["topic_id"],
+                     [rubric_text[(t, int(r))] for t, r in
+                      zip(assessments["topic_id"], assessments["rubric_question_rank"])],
+                     assessments["run_question_text"]))
+    assessments["similarity"] = pair_similarities(pairs, articles, method, model_path)
+
+    similarities = assessments["similarity"].to_numpy()
+    positive = assessments["annotation"].isin(POSITIVE_LABELS).to_numpy()
+    very_similar = (assessments["annotation"] == "very-similar").to_numpy()
+    rows = []
+    for target in targets:
+        threshold = choose_threshold(similarities, positive, target)
+        filtered = similarities < threshold
+        false_negatives = int((filtered & positive).sum())
+        rows.append({
+            "max_fnr": target,
+            "threshold": threshold,
+            "fnr": false_negatives / max(positive.sum(), 1),
+            "fnr_upper95": wilson_upper(false_negatives, int(positive.sum())),
+            "very_similar_fnr": (filtered & very_similar).sum() / max(very_similar.sum(), 1),
+            "pairs_filtered": filtered.mean(),
+        })
+    return pd.DataFrame(rows), assessments
+
+
+def load_articles(path):
+    articles = {}
+    with open(path) as f:
+        for line in f:
+            data = json.loads(line)
+            articles[data["docid"]] = data
+    return articles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the AutoJudge question pair prefilter on human assessments")
+    parser.add_argument("--data_dir", default=DATA_DIR, help="Folder containing the topics and human rubrics")
+    parser.add_argument("--human_input", default=None,
+                        help="CSV file containing human question assessments "
+                             "(default: <data_dir>/human_assessments/question_assessments.csv)")
+    parser.add_argument("--method", choices=["tfidf", "embedding"], default="tfidf")
+    parser.add_argument("--model_path", default=None, help="Local sentence-transformers model (embedding method)")
+    parser.add_argument("--max_fnr", type=float, default=0.02,
+                        help="Max share of similar/very-similar pairs the prefilter may label very-different")
+    parser.add_argument("--output", default=None, help="Optional CSV file to write every pair with its similarity")
+    args = parser.parse_args()
+
+    DATA_DIR = args.data_dir
+    human_input = args.human_input or os.path.join(DATA_DIR, "human_assessments", "question_assessments.csv")
+    assessments = pd.read_csv(human_input)
+    articles = load_articles(os.path.join(DATA_DIR, "trec-2025-dragun-topics.jsonl"))
+    rubrics = load_rubric_index(os.path.join(DATA_DIR, "human_rubrics"), os.path.join(DATA_DIR, CACHE_FOLDER))
+    targets = sorted({0.0, 0.01, 0.02, 0.05, 0.1, args.max_fnr})
+    table, scored = calibrate(assessments, articles, rubrics, args.method, args.model_path, targets)
+
+    positives = scored["annotation"].isin(POSITIVE_LABELS).sum()
+    print(f"{len(scored)} human-assessed pairs, {positives} labeled {' or '.join(POSITIVE_LABELS)}")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    chosen = table[table["max_fnr"] == args.max_fnr].iloc[0]
+    print(f"\nFor a false-negative rate of at most {args.max_fnr:.1%} (95% upper bound {chosen['fnr_upper95']:.1%}), "
+          f"use --prefilter_method {args.method} --prefilter_threshold {np.floor(chosen['threshold'] * 1e6) / 1e6:g}; "
+          f"it would have skipped {chosen['pairs_filtered']:.1%} of these pairs")
+    if args.output:
+        scored.to_csv(args.output, index=False)
@@ -0,0 +1,193 @@
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+try:
+    import prometheus_client
+except ImportError:  # Optional: only needed to export live metrics
+    prometheus_client = None
+
+
+PERCENTILES = [50, 90, 95, 99]
+_metrics = None  # Prometheus metrics, once start_metrics_server has been called
+
+
+# ── Call log ─────────────────────────────────────────────────────────────────
+
+class TelemetryLog:
+    # One JSON line per judge request attempt, cache hit or deduplicated task: the task and its metadata (topic_id,
+    # run_tag, ...), model and endpoint, status, retries so far, queue wait, latency and tokens.
+    # Lines are flushed as they are written, so a running or crashed job can be summarized too.
+
+    def __init__(self, path=None):
+        self.file = open(path, "a") if path else None
+
+    def record(self, **fields):
+        fields = {"time": round(time.time(), 3), **fields}
+        if self.file is not None:
+            self.file.write(json.dumps(fields, ensure_ascii=False, default=str) + "\n")
+            self.file.flush()
+        if _metrics is not None:
+            update_metrics(fields)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def load_log(paths):
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:  # The last line of a log that is still being written
+                    continue
+    return pd.DataFrame(records)
+
+
+# ── Live metrics ─────────────────────────────────────────────────────────────
+
+def start_metrics_server(port):
+    global _metrics
+    if prometheus_client is None:
+        raise ImportError("Exporting metrics needs prometheus_client: pip install prometheus-client")
+    labels = ["task", "model"]
+    _metrics = {
+        "requests": prometheus_client.Counter("autojudge_requests", "Judge request attempts and cache hits",
+                                              labels + ["status"]),
+        "tokens": prometheus_client.Counter("autojudge_tokens", "Tokens of judge responses", labels + ["kind"]),
+        "latency": prometheus_client.Histogram("autojudge_request_latency_seconds", "Judge request latency",
+                                               labels, buckets=[0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600]),
+        "queue_wait": prometheus_client.Histogram("autojudge_queue_wait_seconds",
+                                                  "Time a ready request waited for a concurrency slot", labels,
+                                                  buckets=[0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900]),
+    }
+    prometheus_client.start_http_server(port)
+    print(f"Exporting metrics on http://0.0.0.0:{port}/metrics")
+
+
+def update_metrics(fields):
+    labels = {"task": fields.get("task", ""), "model": fields.get("model", "")}
+    _metrics["requests"].labels(**labels, status=fields.get("status", "")).inc()
+    for kind in ["prompt", "completion", "reasoning", "cached"]:
+        if fields.get(f"{kind}_tokens"):
+            _metrics["tokens"].labels(**labels, kind=kind).inc(fields[f"{kind}_tokens"])
+    if fields.get("latency") is not None:
+        _metrics["latency"].labels(**labels).observe(fields["latency"])
+    if fields.get("queue_wait") is not None:
+        _metrics["queue_wait"].labels(**labels).observe(fields["queue_wait"])
+
+
+# ── Summary report ───────────────────────────────────────────────────────────
+
+def percentile_table(log, column):
+    rows = []
+    for (task, model), group in log.groupby(["task", "model"]):
+        values = group[column].dropna().to_numpy(dtype=float)
+        if len(values) == 0:
+            continue
+        row = {"task": task, "model": model, "n": len(values), "mean": values.mean()}
+        row.update({f"p{p}": np.percentile(values, p) for p in PERCENTILES})
+        row["max"] = values.max()
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def summarize(log, prompt_price=0.0, completion_price=0.0, top=10):
+    # Tables of call counts, latency and queue wait percentiles, tokens per task type, the slowest
+    # topics and the projected tokens, judge time and cost of judging one more run
+    for column in ["prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens", "latency",
+                   "queue_wait", "retries"]:
+        if column not in log:
+            log[column] = np.nan
+    # Cache hits and deduplicated tasks (judged through an identical task) never reached a server
+    sent = log[~log["status"].isin(["cached", "deduplicated"])]
+    ok = log[log["status"] == "ok"]
+    tables = {}
+
+    rows = []
+    for (task, model), group in log.groupby(["task", "model"]):
+        group_ok = group[group["status"] == "ok"]
+        group_sent = group[~group["status"].isin(["cached", "deduplicated"])]
+        rows.append({
+            "task": task,
+            "model": model,
+            "tasks": group["task_index"].nunique(),
+            "requests": len(group_sent),
+            "failed": int((group_sent["status"] != "ok").sum()),
+            "cache_hits": int((group["status"] == "cached").sum()),
+            "deduplicated": int((group["status"] == "deduplicated").sum()),
+            "retried_tasks": int((group_ok["retries"] > 0).sum()),
+            "judge_seconds": group["latency"].sum(),
+        })
+    tables["calls"] = pd.DataFrame(rows)
+    tables["latency_seconds"] = percentile_table(ok, "latency")
+    tables["queue_wait_seconds"] = percentile_table(sent, "queue_wait")
+
+    # Tokens of every request that reached the server, failed ones included, per judged task
+    per_task = sent.groupby(["task", "model", "task_index"])[
+        ["prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens", "latency"]].sum(min_count=1)
+    tokens = per_task.groupby(["task", "model"]).agg(["mean", "sum"])
+    tokens.columns = [f"{column}_{stat}" if stat == "mean" else f"{column}_total" for column, stat in tokens.columns]
+    tables["tokens_per_task"] = tokens.drop(columns=["latency_mean", "latency_total"]).reset_index()
+
+    if "topic_id" in sent:
+        topics = sent.groupby(["task", "topic_id"]).agg(
+            requests=("status", "size"), judge_seconds=("latency", "sum"), mean_latency=("latency", "mean"),
+            prompt_tokens=("prompt_tokens", "sum"), completion_tokens=("completion_tokens", "sum"))
+        tables["slowest_topics"] = (topics.reset_index().sort_values("judge_seconds", ascending=False)
+                                    .groupby("task").head(top).reset_index(drop=True))
+
+    # A new run adds as many tasks as an average run here, each costing what an average judged task cost;
+    # cache hits and deduplicated tasks count as tasks, since a new run's tasks would not be cached and
+    # mostly not duplicates of tasks already judged
+    if "run_tag" in log:
+        rows = []
+        for (task, model), group in log.groupby(["task", "model"]):
+            runs = group["run_tag"].nunique()
+            costs = per_task.loc[(task, model)] if (task, model) in per_task.index else None
+            if not runs or costs is None:
+                continue
+            tasks_per_run = group["task_index"].nunique() / runs
+            prompt_tokens = costs["prompt_tokens"].mean() * tasks_per_run
+            completion_tokens = costs["completion_tokens"].mean() * tasks_per_run
+            rows.append({
+                "task": task,
+                "model": model,
+                "tasks_per_run": tasks_per_run,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "judge_seconds": costs["latency"].mean() * tasks_per_run,
+                "cost": (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6,
+            })
+        tables["projected_per_run"] = pd.DataFrame(rows)
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize AutoJudge per-call telemetry logs")
+    parser.add_argument("--log", required=True, nargs="+",
+                        help="JSONL telemetry log(s) written with auto_judge.py --telemetry_log (e.g. one per shard)")
+    parser.add_argument("--prompt_price", type=float, default=0.0, help="Price per million prompt tokens")
+    parser.add_argument("--completion_price", type=float, default=0.0,
+                        help="Price per million completion tokens (reasoning tokens included)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest topics to list per task")
+    parser.add_argument("--output", default=None, help="Optional JSON file to write every table to")
+    args = parser.parse_args()
+
+    log = load_log(args.log)
+    if log.empty:
+        raise SystemExit("No telemetry records found")
+    tables = summarize(log, args.prompt_price, args.completion_price, args.top)
+    for name, table in tables.items():
+        print(f"\n{name.replace('_', ' ').capitalize()}:")
+        print(table.to_string(index=False, float_format=lambda x: f"{x:,.0f}" if abs(x) >= 1000 else f"{x:.4g}"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({name: table.to_dict(orient="records") for name, table in tables.items()}, f, indent=2,
+                      default=str)
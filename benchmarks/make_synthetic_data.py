@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "auto_judge"))
+from auto_judge import question_organizer_runs, report_organizer_runs  # noqa: E402
+
+
+# Defaults follow the collection stats in the README, with fewer participant runs
+NUM_TOPICS = 30
+NUM_RUBRIC_QUESTIONS = 8  # Per topic
+NUM_ANSWERS = 2  # Short answers per rubric question, on average
+NUM_QUESTION_RUNS = 8  # Participant runs per task; organizer runs are always added
+NUM_REPORT_RUNS = 8
+NUM_QUESTIONS = 10  # Candidate questions per run and topic
+REPORT_SENTENCES = 12
+ARTICLE_SENTENCES = 60
+IMPORTANCE = ["A: Have to Know", "B: Good to Know", "C: Nice to Know"]
+QUESTION_LABELS = (["very-similar", "similar", "different", "very-different"], [1, 2, 3, 14])
+REPORT_LABELS = (["supports", "partial", "contradicts", "none"], [3, 2, 1, 6])
+WORDS = ("article author source claim report evidence funding editor outlet website study expert photo video "
+         "quote statistic review agency company group official record history policy reader audience "
+         "bias accuracy reputation ownership interview document archive survey campaign network blog").split()
+
+
+def sentence(rng, n_words=14):
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    return " ".join(words).capitalize() + "."
+
+
+def question(rng):
+    return rng.choice(["What", "Who", "How", "Why", "When", "Is"]) + " " + " ".join(
+        rng.choice(WORDS) for _ in range(rng.randint(8, 16))) + "?"
+
+
+# ── Synthetic collection ─────────────────────────────────────────────────────
+
+def generate(output_dir, num_topics=NUM_TOPICS, num_rubric_questions=NUM_RUBRIC_QUESTIONS, num_answers=NUM_ANSWERS,
+             num_question_runs=NUM_QUESTION_RUNS, num_report_runs=NUM_REPORT_RUNS, num_questions=NUM_QUESTIONS,
+             seed=0):
+    # Writes topics, rubrics, human assessments and runs in the data/ layout; returns the AutoJudge task counts
+    rng = random.Random(seed)
+    topics = [f"msmarco_v2.1_doc_{t:02d}_{rng.randrange(10 ** 9):09d}" for t in range(num_topics)]
+    question_runs = question_organizer_runs + [f"synthetic-t1-run{r:02d}" for r in range(num_question_runs)]
+    report_runs = report_organizer_runs + [f"synthetic-t2-run{r:02d}" for r in range(num_report_runs)]
+    for folder in ["human_rubrics", "human_assessments", os.path.join("runs", "question_generation_runs"),
+                   os.path.join("runs", "report_generation_runs")]:
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+
+    with open(os.path.join(output_dir, "trec-2025-dragun-topics.jsonl"), "w") as f:
+        for topic_id in topics:
+            f.write(json.dumps({
+                "docid": topic_id,
+                "url": f"https://example.com/{topic_id}",
+                "title": question(rng).rstrip("?"),
+                "headings": "\n".join(sentence(rng, 5) for _ in range(4)),
+                "body": " ".join(sentence(rng) for _ in range(ARTICLE_SENTENCES)),
+            }) + "\n")
+
+    rubrics = {}
+    for topic_id in topics:
+        questions, answer_number = [], 0
+        for q in range(1, num_rubric_questions + 1):
+            answers = []
+            for _ in range(rng.randint(1, 2 * num_answers - 1)):
+                answer_number += 1
+                answers.append({"answer_id": f"{topic_id[-4:]}-{answer_number}", "answer_text": sentence(rng, 8),
+                                "references": [f"{topic_id}#0_{rng.randrange(10 ** 6)}"]})
+            questions.append({"question_id": f"{topic_id}-{q}", "question_text": question(rng),
+                              "importance": rng.choice(IMPORTANCE), "short_answers": answers})
+        rubrics[topic_id] = questions
+        with open(os.path.join(output_dir, "human_rubrics", f"{topic_id}.json"), "w") as f:
+            json.dump({"topic_id": topic_id, "rubrics": questions}, f, indent=2)
+
+    # Question runs, with human labels for every organizer question so each rubric question has examples
+    question_rows = []
+    for run_tag in question_runs:
+        with open(os.path.join(output_dir, "runs", "question_generation_runs", run_tag), "w") as f:
+            for topic_id in topics:
+                text = None
+                for rank in range(1, num_questions + 1):
+                    # Runs sometimes repeat a question, which exercises deduplication
+                    text = text if text is not None and rng.random() < 0.05 else question(rng)
+                    f.write(f"{topic_id}\tsynthetic-team\t{run_tag}\t{rank}\t{text}\n")
+                    if run_tag not in question_organizer_runs:
+                        continue
+                    for q in rubrics[topic_id]:
+                        question_rows.append({
+                            "topic_id": topic_id,
+                            "run_tag": run_tag,
+                            "run_question_rank": rank,
+                            "run_question_text": text,
+                            "rubric_question_rank": int(q["question_id"].split("-")[-1]),
+                            "annotation": rng.choices(*QUESTION_LABELS)[0],
+                        })
+    pd.DataFrame(question_rows).to_csv(os.path.join(output_dir, "human_assessments", "question_assessments.csv"),
+                                       index=False)
+
+    report_rows = []
+    for run_tag in report_runs:
+        with open(os.path.join(output_dir, "runs", "report_generation_runs", run_tag), "w") as f:
+            for topic_id in topics:
+                f.write(json.dumps({
+                    "metadata": {"run_id": run_tag, "topic_id": topic_id},
+                    "responses": [{"text": sentence(rng, rng.randint(10, 25)),
+                                   "citations": [f"{topic_id}#0_{rng.randrange(10 ** 6)}"]}
+                                  for _ in range(REPORT_SENTENCES)],
+                }) + "\n")
+                for q in rubrics[topic_id]:
+                    for a in q["short_answers"]:
+                        report_rows.append({"topic_id": topic_id, "run_tag": run_tag, "answer_id": a["answer_id"],
+                                            "annotation": rng.choices(*REPORT_LABELS)[0]})
+    pd.DataFrame(report_rows).to_csv(os.path.join(output_dir, "human_assessments", "report_assessments.csv"),
+                                     index=False)
+
+    # The compound check covers organizer runs too; the judges only participant runs
+    return {
+        "auto_compound_question_check": num_topics * num_questions * len(question_runs),
+        "auto_question_evaluation": num_topics * num_rubric_questions * num_question_runs * num_questions,
+        "auto_report_evaluation": num_topics * num_report_runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic DRAGUN collection for AutoJudge benchmarks")
+    parser.add_argument("--output_dir", required=True, help="Folder to write the data/ layout into")
+    parser.add_argument("--num_topics", type=int, default=NUM_TOPICS)
+    parser.add_argument("--num_rubric_questions", type=int, default=NUM_RUBRIC_QUESTIONS)
+    parser.add_argument("--num_answers", type=int, default=NUM_ANSWERS,
+                        help="Average short answers per rubric question")
+    parser.add_argument("--num_question_runs", type=int, default=NUM_QUESTION_RUNS,
+                        help="Participant Task 1 runs (organizer runs are added)")
+    parser.add_argument("--num_report_runs", type=int, default=NUM_REPORT_RUNS,
+                        help="Participant Task 2 runs (organizer runs are added)")
+    parser.add_argument("--num_questions", type=int, default=NUM_QUESTIONS, help="Questions per run and topic")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.output_dir, args.num_topics, args.num_rubric_questions, args.num_answers,
+                      args.num_question_runs, args.num_report_runs, args.num_questions, args.seed)
+    for task, n in counts.items():
+        print(f"{task}: {n} tasks")
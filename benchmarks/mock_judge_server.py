@@ -0,0 +1,163 @@
+import re
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+LATENCY = 0.05  # Mean seconds per response
+LATENCY_DIST = "exponential"  # "constant", "exponential" or "lognormal"
+LATENCY_SIGMA = 1.0  # Spread of the lognormal distribution
+ERROR_RATE = 0.0  # Share of requests answered with HTTP 500
+INVALID_RATE = 0.0  # Share of responses whose JSON is cut short, so they fail validation
+SEED = 0
+ANSWER_ID_RE = re.compile(r'"answer_id"\s*:\s*"([^"]+)"')
+CANDIDATE_RANK_RE = re.compile(r'"candidate_rank"\s*:\s*(\d+)')
+
+_random = random.Random(SEED)  # Latency and error injection, shared by all request threads
+_lock = threading.Lock()
+
+
+# ── Schema-valid responses ───────────────────────────────────────────────────
+
+def fill(schema, defs, prompt, rng):
+    # A random instance of the JSON schema; list items are the answer ids or candidate ranks of the prompt
+    if "$ref" in schema:
+        return fill(defs[schema["$ref"].split("/")[-1]], defs, prompt, rng)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if schema.get("type") == "object":
+        return {name: fill(prop, defs, prompt, rng) for name, prop in schema["properties"].items()}
+    if schema.get("type") == "array":
+        item = schema["items"]
+        properties = (defs[item["$ref"].split("/")[-1]] if "$ref" in item else item)["properties"]
+        if "answer_id" in properties:
+            ids = list(dict.fromkeys(ANSWER_ID_RE.findall(prompt)))
+            return [dict(fill(item, defs, prompt, rng), answer_id=i) for i in ids]
+        if "candidate_rank" in properties:
+            ranks = list(dict.fromkeys(int(r) for r in CANDIDATE_RANK_RE.findall(prompt)))
+            return [dict(fill(item, defs, prompt, rng), candidate_rank=r) for r in ranks]
+        return []
+    if schema.get("type") == "integer":
+        return rng.randint(1, 10)
+    if schema.get("type") == "string":
+        return "Mock rationale: " + " ".join(rng.choice(["the", "question", "article", "answer", "report"])
+                                             for _ in range(rng.randint(10, 40)))
+    return None
+
+
+def completion(body):
+    # Contents depend only on the request, so every run of a benchmark gets the same answers
+    prompt = "\n".join(m["content"] for m in body["messages"])
+    schema = body["response_format"]["json_schema"]["schema"]
+    seed = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+    choices = []
+    for k in range(body.get("n") or 1):
+        rng = random.Random(f"{seed}-{k}")
+        content = json.dumps(fill(schema, schema.get("$defs", {}), prompt, rng))
+        with _lock:
+            invalid = _random.random() < INVALID_RATE
+        if invalid:
+            content = content[:len(content) // 2]
+        choice = {"index": k, "finish_reason": "stop",
+                  "message": {"role": "assistant", "content": content, "reasoning_content": "Mock reasoning."}}
+        if body.get("logprobs"):
+            # ~4 characters per token, each fairly but not fully certain
+            tokens = [content[j:j + 4] for j in range(0, len(content), 4)]
+            choice["logprobs"] = {"content": [{"token": t, "logprob": -rng.random() * 0.1, "bytes": list(t.encode()),
+                                               "top_logprobs": []} for t in tokens]}
+        choices.append(choice)
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = sum(len(c["message"]["content"]) // 4 for c in choices)
+    return {
+        "id": f"chatcmpl-{seed[:16]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": choices,
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def sample_latency():
+    with _lock:
+        if LATENCY_DIST == "constant":
+            return LATENCY
+        if LATENCY_DIST == "lognormal":
+            # Parameterized so the mean stays LATENCY whatever the spread
+            return _random.lognormvariate(0, LATENCY_SIGMA) * LATENCY / math.exp(LATENCY_SIGMA ** 2 / 2)
+        return _random.expovariate(1 / LATENCY) if LATENCY > 0 else 0.0
+
+
+# ── Server ───────────────────────────────────────────────────────────────────
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like vLLM, so clients reuse their connections
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(sample_latency())
+        with _lock:
+            error = _random.random() < ERROR_RATE
+        if error:
+            self.send_json(500, {"error": {"message": "injected server error", "type": "server_error"}})
+        elif not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "not found"}})
+        else:
+            self.send_json(200, completion(body))
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # The judge keeps hundreds of requests in flight
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible judge server for AutoJudge benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Mean response latency in seconds")
+    parser.add_argument("--latency_dist", choices=["constant", "exponential", "lognormal"], default=LATENCY_DIST)
+    parser.add_argument("--latency_sigma", type=float, default=LATENCY_SIGMA, help="Spread of lognormal latencies")
+    parser.add_argument("--error_rate", type=float, default=ERROR_RATE, help="Share of requests failing with HTTP 500")
+    parser.add_argument("--invalid_rate", type=float, default=INVALID_RATE,
+                        help="Share of responses with truncated, schema-invalid JSON")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    LATENCY_DIST = args.latency_dist
+    LATENCY_SIGMA = args.latency_sigma
+    ERROR_RATE = args.error_rate
+    INVALID_RATE = args.invalid_rate
+    _random.seed(args.seed)
+
+    server = Server((args.host, args.port), Handler)
+    print(f"Mock judge server on http://{args.host}:{server.server_port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from make_synthetic_data import (generate, NUM_TOPICS, NUM_RUBRIC_QUESTIONS, NUM_ANSWERS, NUM_QUESTION_RUNS,
+                                 NUM_REPORT_RUNS, NUM_QUESTIONS)
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+AUTO_JUDGE = os.path.join(REPO_DIR, "auto_judge", "auto_judge.py")
+SCORE = os.path.join(REPO_DIR, "utils", "score.py")
+MOCK_SERVER = os.path.join(SCRIPT_DIR, "mock_judge_server.py")
+RESULTS_DIR = os.path.join(SCRIPT_DIR, "results")
+
+
+# ── Measurement ──────────────────────────────────────────────────────────────
+
+def measure(cmd, log_path):
+    # Wall time of the process, and its own CPU time and peak memory (not the mock server's)
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=REPO_DIR)
+        _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        with open(log_path) as f:
+            tail = f.read()[-2000:]
+        raise RuntimeError(f"{' '.join(cmd[:3])} exited with {proc.returncode}, see {log_path}:\n{tail}")
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    return {"wall_seconds": wall, "cpu_user_seconds": usage.ru_utime, "cpu_system_seconds": usage.ru_stime,
+            "peak_rss_mb": peak_rss}
+
+
+def count_tasks(name, output_dir):
+    if name == "auto_report_evaluation":
+        output = pd.read_csv(os.path.join(output_dir, "auto_report_assessments.csv"))
+        return len(output.drop_duplicates(["topic_id", "run_tag"]))
+    if name == "score_report_generation":
+        return len(pd.read_csv(os.path.join(output_dir, "auto_report_assessments.csv")))
+    if name in ["auto_question_evaluation", "score_question_generation"]:
+        return len(pd.read_csv(os.path.join(output_dir, "auto_question_assessments.csv")))
+    return len(pd.read_csv(os.path.join(output_dir, "auto_compound_question_check.csv")))
+
+
+def benchmark_commands(data_dir, output_dir, score_dir, base_url, concurrency, auto_judge_args):
+    question_runs = os.path.join(data_dir, "runs", "question_generation_runs")
+    report_runs = os.path.join(data_dir, "runs", "report_generation_runs")
+    judge = [sys.executable, AUTO_JUDGE, "--data_dir", data_dir, "--output_folder_path", output_dir,
+             "--base_urls", base_url, "--concurrency", str(concurrency), "--no_cache"] + auto_judge_args
+    score = [sys.executable, SCORE, "--data_dir", data_dir, "--type", "auto", "--output", score_dir]
+    return {
+        "auto_compound_question_check": judge + ["--task", "auto_compound_question_check",
+                                                 "--input_folder_path", question_runs],
+        "auto_question_evaluation": judge + ["--task", "auto_question_evaluation", "--input_folder_path",
+                                             question_runs],
+        "auto_report_evaluation": judge + ["--task", "auto_report_evaluation", "--input_folder_path", report_runs],
+        "score_question_generation": score + [
+            "--task", "question_generation_evaluation",
+            "--assessment_input", os.path.join(output_dir, "auto_question_assessments.csv"),
+            "--compound_check_input", os.path.join(output_dir, "auto_compound_question_check.csv")],
+        "score_report_generation": score + [
+            "--task", "report_generation_evaluation",
+            "--assessment_input", os.path.join(output_dir, "auto_report_assessments.csv")],
+    }
+
+
+def start_mock_server(args):
+    cmd = [sys.executable, MOCK_SERVER, "--port", "0", "--latency", str(args.latency),
+           "--latency_dist", args.latency_dist, "--error_rate", str(args.error_rate),
+           "--invalid_rate", str(args.invalid_rate), "--seed", str(args.seed)]
+    server = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    # The server prints its address once it is listening
+    base_url = server.stdout.readline().split()[-1]
+    return server, base_url
+
+
+# ── Results ──────────────────────────────────────────────────────────────────
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def summarize(runs, tasks):
+    # Medians over repeats, which are less sensitive to a stray slow run than means
+    summary = {"tasks": tasks, "repeats": len(runs)}
+    for metric in runs[0]:
+        summary[metric] = round(float(np.median([run[metric] for run in runs])), 4)
+    summary["tasks_per_second"] = round(tasks / max(summary["wall_seconds"], 1e-9), 2)
+    summary["cpu_ms_per_task"] = round(1000 * (summary["cpu_user_seconds"] + summary["cpu_system_seconds"]) /
+                                       max(tasks, 1), 4)
+    return summary
+
+
+def print_comparison(results, baseline):
+    rows = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+        rows.append({
+            "benchmark": name,
+            "tasks_per_second": f"{previous['tasks_per_second']:.1f} -> {current['tasks_per_second']:.1f}",
+            "throughput": f"{current['tasks_per_second'] / max(previous['tasks_per_second'], 1e-9) - 1:+.1%}",
+            "cpu_ms_per_task": f"{previous['cpu_ms_per_task']:.3f} -> {current['cpu_ms_per_task']:.3f}",
+            "peak_rss_mb": f"{previous['peak_rss_mb']:.0f} -> {current['peak_rss_mb']:.0f}",
+        })
+    if baseline.get("config") != results["config"]:
+        print("Warning: the baseline was run with a different configuration")
+    print(f"\nCompared with {baseline.get('commit', 'baseline')}:")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline AutoJudge and scoring benchmarks against a mock judge server")
+    parser.add_argument("--num_topics", type=int, default=NUM_TOPICS)
+    parser.add_argument("--num_rubric_questions", type=int, default=NUM_RUBRIC_QUESTIONS)
+    parser.add_argument("--num_answers", type=int, default=NUM_ANSWERS)
+    parser.add_argument("--num_question_runs", type=int, default=NUM_QUESTION_RUNS)
+    parser.add_argument("--num_report_runs", type=int, default=NUM_REPORT_RUNS)
+    parser.add_argument("--num_questions", type=int, default=NUM_QUESTIONS)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean mock server latency in seconds")
+    parser.add_argument("--latency_dist", choices=["constant", "exponential", "lognormal"], default="exponential")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of mock requests failing with HTTP 500")
+    parser.add_argument("--invalid_rate", type=float, default=0.0, help="Share of mock responses with invalid JSON")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--auto_judge_args", default="",
+                        help="Extra auto_judge.py arguments, e.g. \"--prompt_style compact\"")
+    parser.add_argument("--benchmarks", nargs="+", default=None,
+                        help="Subset of benchmarks to run (the score benchmarks need the judge outputs)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark; medians are reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work_dir", default=None, help="Folder for data, outputs and logs (default: temporary)")
+    parser.add_argument("--output", default=None, help="Results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Results JSON of an earlier commit to compare with")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="autojudge-bench-")
+    data_dir = os.path.join(work_dir, "data")
+    shutil.rmtree(data_dir, ignore_errors=True)
+    expected = generate(data_dir, args.num_topics, args.num_rubric_questions, args.num_answers,
+                        args.num_question_runs, args.num_report_runs, args.num_questions, args.seed)
+    print(f"Synthetic data in {data_dir}: " + ", ".join(f"{n} {task} tasks" for task, n in expected.items()))
+
+    server, base_url = start_mock_server(args)
+    measurements = {}
+    try:
+        for repeat in range(args.repeat):
+            # A fresh output folder per repeat, so no run resumes from an earlier one's checkpoints
+            output_dir = os.path.join(work_dir, f"output-{repeat}")
+            score_dir = os.path.join(work_dir, f"scores-{repeat}")
+            shutil.rmtree(output_dir, ignore_errors=True)
+            commands = benchmark_commands(data_dir, output_dir, score_dir, base_url, args.concurrency,
+                                          shlex.split(args.auto_judge_args))
+            for name, cmd in commands.items():
+                if args.benchmarks and name not in args.benchmarks:
+                    continue
+                run = measure(cmd, os.path.join(work_dir, f"{name}-{repeat}.log"))
+                measurements.setdefault(name, []).append(run)
+                print(f"{name} [{repeat + 1}/{args.repeat}]: {run['wall_seconds']:.2f}s wall, "
+                      f"{run['cpu_user_seconds'] + run['cpu_system_seconds']:.2f}s CPU, "
+                      f"{run['peak_rss_mb']:.0f} MB peak")
+    finally:
+        server.terminate()
+        server.wait()
+
+    config = {k: v for k, v in vars(args).items() if k not in ["work_dir", "output", "compare", "benchmarks"]}
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "benchmarks": {name: summarize(runs, count_tasks(name, os.path.join(work_dir, "output-0")))
+                       for name, runs in measurements.items()},
+    }
+    print("\n" + pd.DataFrame(results["benchmarks"]).T.to_string())
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
@@ -0,0 +1,46 @@
+import os
+import sys
+import math
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "auto_judge"))
+from auto_judge import decision_confidence  # noqa: E402
+
+
+def logprobs(pieces):
+    # pieces: (token string as the server returns it, bytes it covers, logprob)
+    return SimpleNamespace(content=[SimpleNamespace(token=token, bytes=list(data), logprob=logprob)
+                                    for token, data, logprob in pieces])
+
+
+def test_decision_confidence_ascii():
+    content = '{"rationale":"Same focus.","assessment_decision":"similar"}'
+    pieces = [('{"rationale":"Same focus.","assessment_decision":"', -0.01), ("sim", -0.5), ("ilar", -0.25),
+              ('"}', 0.0)]
+    result = decision_confidence(content, logprobs([(t, t.encode(), lp) for t, lp in pieces]))
+    # Only the tokens of the value count, not the key before it
+    assert math.isclose(result, math.exp(-0.5 - 0.25))
+
+
+def test_decision_confidence_multibyte_rationale():
+    # Byte-fallback tokens for the accented letters, dash and curly quotes: their token strings are not the
+    # characters they cover, so counting characters would shift the decision span onto other tokens
+    content = '{"rationale":"Café — “naïve” claim","assessment_decision":"similar"}'
+    pieces = [('{"rationale":"Caf', '{"rationale":"Caf'.encode(), 0.0)]
+    for char in "é — “naïve”":
+        if char.isascii():
+            pieces.append((char, char.encode(), 0.0))
+        else:
+            pieces += [(f"bytes:\\x{b:02x}", bytes([b]), 0.0) for b in char.encode()]
+    pieces += [(t, t.encode(), lp) for t, lp in [(' claim","assessment_decision":"', 0.0), ("sim", -0.5),
+                                                 ("ilar", -0.25), ('"}', 0.0)]]
+    assert b"".join(data for _, data, _ in pieces) == content.encode()
+    result = decision_confidence(content, logprobs(pieces))
+    assert math.isclose(result, math.exp(-0.75))
+
+
+def test_decision_confidence_misaligned_tokens():
+    # Tokens that do not spell out the content give no confidence, so the task is escalated
+    content = '{"rationale":"x","assessment_decision":"similar"}'
+    assert decision_confidence(content, logprobs([("{", b"{", 0.0)])) == 0.0
+    assert decision_confidence(content, None) == 0.0
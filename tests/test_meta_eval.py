@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from meta_eval import kendall_tau_b, meta_evaluate  # noqa: E402
+
+
+def per_topic(scores):
+    # {run_tag: [score per topic]} as a per-topic result frame
+    return pd.DataFrame([{"run_tag": run_tag, "topic_id": f"t{k}", "score": score}
+                         for run_tag, values in scores.items() for k, score in enumerate(values)])
+
+
+def test_kendall_tau_b_with_ties():
+    # 5 concordant pairs and 1 pair tied in x only: 5 / sqrt(5 * 6), where tau-a would give 5 / 6
+    x = np.array([1.0, 2.0, 2.0, 3.0])
+    y = np.array([1.0, 3.0, 2.0, 4.0])
+    assert np.isclose(kendall_tau_b(x, y), 5 / np.sqrt(30))
+
+
+def test_no_common_runs_or_topics():
+    human = per_topic({"a": [0.5, 0.4], "b": [0.2, 0.1]})
+    with pytest.raises(ValueError, match="no runs in common"):
+        meta_evaluate(human, human.assign(run_tag=human["run_tag"] + "-x"), bootstrap_samples=10,
+                      permutation_samples=10)
+    with pytest.raises(ValueError, match="no topics in common"):
+        meta_evaluate(human, human.assign(topic_id=human["topic_id"] + "-x"), bootstrap_samples=10,
+                      permutation_samples=10)
+
+
+def test_tied_runs_share_a_rank():
+    human = per_topic({"a": [0.5, 0.5], "b": [0.5, 0.5], "c": [0.1, 0.2]})
+    summary, run_scores, _ = meta_evaluate(human, human, bootstrap_samples=50, permutation_samples=50)
+    ranks = run_scores.set_index("run_tag")
+    assert list(ranks.loc[["a", "b", "c"], "human_rank"]) == [1, 1, 3]
+    assert (ranks["human_rank"] == ranks["auto_rank"]).all()
+    assert summary["kendall_tau_b"] == 1.0
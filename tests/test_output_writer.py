@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import pytest
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "auto_judge"))
+import auto_judge  # noqa: E402
+from output_writer import StreamingWriter  # noqa: E402
+
+
+def row(i, rationale="Fixture."):
+    return {"task_index": i, "topic_id": "t1", "run_tag": f"run-{i}", "auto_assessment": "similar",
+            "auto_rationale": rationale}
+
+
+def test_resume_after_interrupted_write(tmp_path):
+    stem = str(tmp_path / "out")
+    writer = StreamingWriter(stem, "fp", commit_interval=3600)
+    writer.write([0], [row(0, "First line.\nSecond line.")])
+    writer.write([1], [row(1)])
+    writer.commit()
+    writer.write([2], [row(2)])
+    # The process dies midway through a record, after the last checkpoint
+    writer.file.write('3,t1,run-3,similar,"Cut off\n')
+    writer.file.flush()
+    writer.file.close()
+    writer.file = None
+
+    resumed = StreamingWriter(stem, "fp", commit_interval=3600)
+    assert resumed.completed == {0, 1}
+    assert os.path.getsize(f"{stem}.partial.csv") == json.load(open(f"{stem}.checkpoint.json"))["committed_bytes"]
+    resumed.write([2], [row(2)])
+    rows = resumed.rows()
+    assert list(rows["task_index"]) == ["0", "1", "2"]
+    assert rows["auto_rationale"][0] == "First line.\nSecond line."
+
+
+def test_changed_settings_start_over(tmp_path):
+    stem = str(tmp_path / "out")
+    with StreamingWriter(stem, "fp", commit_interval=3600) as writer:
+        writer.write([0], [row(0)])
+
+    # A dry run keeps the files of the real job, even when they do not match its settings
+    StreamingWriter(stem, "other", read_only=True)
+    assert os.path.exists(f"{stem}.partial.csv")
+    assert StreamingWriter(stem, "fp", read_only=True).completed == {0}
+
+    writer = StreamingWriter(stem, "other")
+    assert writer.completed == set()
+    assert not os.path.exists(f"{stem}.partial.csv")
+
+
+def write_shard(tmp_path, monkeypatch, shard_index, task_indices):
+    monkeypatch.setattr(auto_judge, "NUM_SHARDS", 2)
+    monkeypatch.setattr(auto_judge, "SHARD_INDEX", shard_index)
+    writer = StreamingWriter(str(tmp_path / f"out.shard-{shard_index}-of-2"), "fp")
+    for i in task_indices:
+        writer.write([i], [row(i)])
+    auto_judge.write_output(writer, str(tmp_path), "out.csv", ["topic_id", "run_tag"], num_tasks=4)
+
+
+def test_merge_shards(tmp_path, monkeypatch):
+    write_shard(tmp_path, monkeypatch, 0, [0, 2])
+    write_shard(tmp_path, monkeypatch, 1, [1, 3])
+    output_folder = tmp_path / "merged"
+    output_folder.mkdir()
+    auto_judge.merge_shards(str(tmp_path), str(output_folder))
+    merged = pd.read_csv(output_folder / "out.csv")
+    assert list(merged["run_tag"]) == ["run-0", "run-1", "run-2", "run-3"]
+    assert "task_index" not in merged
+
+
+def test_merge_shards_missing_shard(tmp_path, monkeypatch):
+    write_shard(tmp_path, monkeypatch, 0, [0, 2])
+    with pytest.raises(ValueError, match=r"missing shards \[1\]"):
+        auto_judge.merge_shards(str(tmp_path), str(tmp_path))
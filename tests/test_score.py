@@ -0,0 +1,95 @@
+import os
+import sys
+import pytest
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+import score  # noqa: E402
+
+
+# The expected CSVs were written by the original loop-based utils/score.py on this fixture; the scorer
+# must keep reproducing them byte for byte
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "score")
+EXPECTED_DIR = os.path.join(FIXTURE_DIR, "expected")
+
+QUESTION_CASES = [
+    ("human", "question_assessments.csv", "annotation"),
+    ("auto_pair", "auto_question_assessments_pair.csv", "auto_assessment"),
+    ("auto_batch", "auto_question_assessments_batch.csv", "auto_assessment"),
+]
+REPORT_CASES = [
+    ("human", "report_assessments.csv", "annotation"),
+    ("auto", "auto_report_assessments.csv", "auto_assessment"),
+]
+
+
+@pytest.fixture
+def rubrics(tmp_path, monkeypatch):
+    # The run index cache goes to the temporary folder, not into the fixture
+    monkeypatch.setattr(score, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(score, "RUBRICS_DIR", os.path.join(FIXTURE_DIR, "human_rubrics"))
+    return score.load_rubrics()
+
+
+def read_assessments(name, label_column):
+    return pd.read_csv(os.path.join(FIXTURE_DIR, name)).rename(columns={label_column: "annotation"})
+
+
+def assert_same_files(output_dir, prefix, kind):
+    for level in ["per_topic", "per_run"]:
+        name = f"{prefix}_{kind}_{level}_results.csv"
+        with open(os.path.join(output_dir, name)) as f, open(os.path.join(EXPECTED_DIR, name)) as g:
+            assert f.read() == g.read(), name
+
+
+@pytest.mark.parametrize("prefix,name,label_column", QUESTION_CASES)
+def test_question_generation_matches_baseline(tmp_path, rubrics, prefix, name, label_column):
+    compound = pd.read_csv(os.path.join(FIXTURE_DIR, "auto_compound_question_check.csv"))
+    score.score_question_generation(read_assessments(name, label_column), compound, rubrics, str(tmp_path), prefix)
+    assert_same_files(tmp_path, prefix, "question_generation")
+
+
+@pytest.mark.parametrize("prefix,name,label_column", REPORT_CASES)
+def test_report_generation_matches_baseline(tmp_path, rubrics, prefix, name, label_column):
+    score.score_report_generation(read_assessments(name, label_column), rubrics, str(tmp_path), prefix)
+    assert_same_files(tmp_path, prefix, "report_generation")
+
+
+def test_score_many_matches_single_files(rubrics):
+    compound = pd.read_csv(os.path.join(FIXTURE_DIR, "auto_compound_question_check.csv"))
+    paths = [os.path.join(FIXTURE_DIR, name) for _, name, label in QUESTION_CASES if label == "auto_assessment"]
+    results = score.score_many("question_generation_evaluation", paths, rubrics, compound, "auto_assessment")
+    for (prefix, _, _), path in zip(QUESTION_CASES[1:], paths):
+        per_topic, per_run = results[path]
+        expected = os.path.join(EXPECTED_DIR, f"{prefix}_question_generation_per_topic_results.csv")
+        assert per_topic.to_csv(index=False) == open(expected).read()
+
+
+def test_partial_output_cut_inside_a_quoted_field(tmp_path):
+    # A running job may stop writing after a newline inside a multiline rationale
+    path = tmp_path / "auto_question_assessments.partial.csv"
+    path.write_text(
+        "task_index,topic_id,run_tag,auto_assessment,auto_rationale\n"
+        '0,t1,run-a,similar,"Two\nlines"\n'
+        "1,t1,run-b,different,One line\n"
+        '2,t1,run-c,similar,"Cut\n'
+    )
+    df = score.read_output(str(path), partial=True)
+    assert list(df["run_tag"]) == ["run-a", "run-b"]
+    assert df["auto_rationale"][0] == "Two\nlines"
+    assert "task_index" not in df
+
+
+def test_cascade_columns_do_not_count_as_missing(tmp_path, rubrics):
+    # Placeholder rows and escalations after a failed first pass, plus empty values as older outputs wrote
+    # them, do not stop scoring or drop rows
+    df = pd.read_csv(os.path.join(FIXTURE_DIR, "auto_question_assessments_pair.csv"))
+    df["judge_model"] = ["none", "judge", "first-pass", "judge"] * (len(df) // 4) + ["none"] * (len(df) % 4)
+    df["first_pass_confidence"] = ["none", "failed", "0.9500", ""] * (len(df) // 4) + ["none"] * (len(df) % 4)
+    path = tmp_path / "auto_question_assessments.csv"
+    df.to_csv(path, index=False)
+    compound = pd.read_csv(os.path.join(FIXTURE_DIR, "auto_compound_question_check.csv"))
+    assessments = score.read_output(str(path)).rename(columns={"auto_assessment": "annotation"})
+    assert assessments["first_pass_confidence"].isna().any()
+    score.score_question_generation(assessments, compound, rubrics, str(tmp_path), "auto_pair")
+    assert_same_files(tmp_path, "auto_pair", "question_generation")
@@ -0,0 +1,85 @@
+import argparse
+import itertools
+import pandas as pd
+
+
+KEYS = {
+    "question_generation_evaluation": ["topic_id", "run_tag", "run_question_rank", "rubric_question_rank"],
+    "report_generation_evaluation": ["topic_id", "run_tag", "answer_id"],
+}
+LABELS = {
+    "question_generation_evaluation": ["very-similar", "similar", "different", "very-different"],
+    "report_generation_evaluation": ["supports", "partial", "contradicts", "none"],
+}
+
+
+# ── Agreement statistics ─────────────────────────────────────────────────────
+
+def cohen_kappa(a, b, labels):
+    confusion = pd.crosstab(pd.Categorical(a, categories=labels), pd.Categorical(b, categories=labels),
+                            dropna=False).to_numpy(dtype=float)
+    n = confusion.sum()
+    if n == 0:
+        return float("nan")
+    observed = confusion.trace() / n
+    expected = (confusion.sum(axis=0) * confusion.sum(axis=1)).sum() / n ** 2
+    return (observed - expected) / (1 - expected) if expected < 1 else 1.0
+
+
+def compare(left, right, task, left_name, right_name):
+    keys = KEYS[task]
+    merged = left[keys + ["label"]].merge(right[keys + ["label"]], on=keys, suffixes=("_left", "_right"))
+    a, b = merged["label_left"], merged["label_right"]
+    return {
+        "left": left_name,
+        "right": right_name,
+        "pairs": len(merged),
+        "accuracy": (a == b).mean() if len(merged) else float("nan"),
+        "kappa": cohen_kappa(a, b, LABELS[task]),
+    }, pd.crosstab(a.rename(left_name), b.rename(right_name))
+
+
+def load_labels(path, task):
+    df = pd.read_csv(path)
+    label_col = "auto_assessment" if "auto_assessment" in df.columns else "annotation"
+    df = df.rename(columns={label_col: "label"})
+    return df.drop_duplicates(subset=KEYS[task], keep="first")
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label agreement between AutoJudge outputs and human assessments")
+    parser.add_argument("--task", required=True, choices=list(KEYS))
+    parser.add_argument("--human_input", required=True, help="CSV file containing human assessments")
+    parser.add_argument("--auto_input", required=True, nargs="+",
+                        help="One or more AutoJudge assessment CSVs (e.g. pair and batch judging modes)")
+    parser.add_argument("--group_by", default=None,
+                        help="Also report agreement with humans per value of this AutoJudge column "
+                             "(e.g. judge_model for cascade outputs)")
+    parser.add_argument("--output", required=False, help="Optional CSV file to write the agreement table")
+    args = parser.parse_args()
+
+    human = load_labels(args.human_input, args.task)
+    autos = {p: load_labels(p, args.task) for p in args.auto_input}
+
+    rows = []
+    for name, auto in autos.items():
+        row, confusion = compare(human, auto, args.task, "human", name)
+        rows.append(row)
+        print(f"\nhuman vs {name}:\n{confusion.to_string()}")
+        if args.group_by and args.group_by in auto.columns:
+            for value, group in auto.groupby(auto[args.group_by].fillna("")):
+                group_name = f"{name} [{args.group_by}={value}]"
+                row, confusion = compare(human, group, args.task, "human", group_name)
+                rows.append(row)
+                print(f"\nhuman vs {group_name}:\n{confusion.to_string()}")
+    for (name_a, a), (name_b, b) in itertools.combinations(autos.items(), 2):
+        row, confusion = compare(a, b, args.task, name_a, name_b)
+        rows.append(row)
+        print(f"\n{name_a} vs {name_b}:\n{confusion.to_string()}")
+
+    table = pd.DataFrame(rows)
+    print("\n" + table.to_string(index=False))
+    if args.output:
+        table.to_csv(args.output, index=False)
@@ -0,0 +1,163 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+
+BOOTSTRAP_SAMPLES = 10000
+PERMUTATION_SAMPLES = 10000
+RBO_P = 0.9  # Rank-biased overlap persistence: the top 1 / (1 - p) runs carry most of the weight
+ALPHA = 0.05
+CHUNK_SIZE = 1000  # Resamples evaluated per batch, which bounds memory at chunk x topics x runs floats
+
+
+# ── Score matrices ───────────────────────────────────────────────────────────
+
+def score_matrices(human, auto, score_column="score"):
+    # Topic-by-run matrices of the per-topic results for the runs and topics in both; a topic a run
+    # did not submit is NaN and left out of that run's mean, as in the per-run results
+    runs = sorted(set(human["run_tag"]) & set(auto["run_tag"]))
+    topics = sorted(set(human["topic_id"]) & set(auto["topic_id"]))
+    if not runs or not topics:
+        raise ValueError(f"The human and automatic results have no {'runs' if not runs else 'topics'} in common")
+    for name, per_topic in [("human", human), ("automatic", auto)]:
+        dropped_runs = set(per_topic["run_tag"]) - set(runs)
+        dropped_topics = set(per_topic["topic_id"]) - set(topics)
+        if dropped_runs or dropped_topics:
+            print(f"Warning: {len(dropped_runs)} runs and {len(dropped_topics)} topics of the {name} results "
+                  f"are not in the other results and are left out")
+    matrices = []
+    for per_topic in [human, auto]:
+        matrix = per_topic.pivot_table(index="topic_id", columns="run_tag", values=score_column, aggfunc="first")
+        matrices.append(matrix.reindex(index=topics, columns=runs).to_numpy(dtype=float))
+    return matrices[0], matrices[1], topics, runs
+
+
+def run_means(matrices):
+    # Per-run means over the topic axis (second to last) of one or a batch of matrices
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # A resample may contain no topic of a run
+        return np.nanmean(matrices, axis=-2)
+
+
+# ── Rank correlation ─────────────────────────────────────────────────────────
+
+def kendall_tau_b(x, y):
+    # Kendall's tau-b between score vectors along the last axis, for any leading batch shape
+    i, j = np.triu_indices(x.shape[-1], 1)
+    dx = np.sign(x[..., i] - x[..., j])
+    dy = np.sign(y[..., i] - y[..., j])
+    denominator = np.sqrt(np.count_nonzero(dx, axis=-1) * np.count_nonzero(dy, axis=-1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (dx * dy).sum(axis=-1) / denominator
+
+
+def rbo(x, y, p=RBO_P):
+    # Extrapolated rank-biased overlap (Webber et al., 2010) of the rankings by descending score along
+    # the last axis; both rankings hold the same runs, so the overlap at full depth is complete.
+    # Ties are broken by run order, the same way in both rankings.
+    n = x.shape[-1]
+    depth = np.arange(1, n + 1)
+    rank_x = np.argsort(np.argsort(-x, axis=-1, kind="stable"), axis=-1)
+    rank_y = np.argsort(np.argsort(-y, axis=-1, kind="stable"), axis=-1)
+    # A run is in both top-d lists once d exceeds its worse rank
+    deepest = np.maximum(rank_x, rank_y)
+    overlap = (deepest[..., :, None] < depth).sum(axis=-2)
+    agreement = overlap / depth
+    return (agreement[..., -1] * p ** n + (1 - p) / p * (agreement * p ** depth).sum(axis=-1))
+
+
+# ── Resampling ───────────────────────────────────────────────────────────────
+
+def paired_bootstrap(human, auto, n_samples=BOOTSTRAP_SAMPLES, rng=None, p=RBO_P):
+    # Resamples topics with replacement, the same topics for both evaluations; returns the per-run means
+    # of each resample (samples x runs) and the rank correlations between them
+    rng = np.random.default_rng(0) if rng is None else rng
+    n_topics = human.shape[0]
+    human_means, auto_means = [], []
+    for start in range(0, n_samples, CHUNK_SIZE):
+        topics = rng.integers(0, n_topics, size=(min(CHUNK_SIZE, n_samples - start), n_topics))
+        human_means.append(run_means(human[topics]))
+        auto_means.append(run_means(auto[topics]))
+    human_means = np.concatenate(human_means)
+    auto_means = np.concatenate(auto_means)
+    return human_means, auto_means, kendall_tau_b(human_means, auto_means), rbo(human_means, auto_means, p)
+
+
+def randomization_test(matrix, n_samples=PERMUTATION_SAMPLES, rng=None):
+    # Paired randomization test of every run pair: under the null hypothesis the two runs' scores on a
+    # topic are exchangeable, so the sign of each topic's difference is flipped at random. All pairs
+    # share the flips and are tested with one matrix product per batch.
+    # Returns the pairs (i, j), their mean differences and two-sided p-values.
+    rng = np.random.default_rng(0) if rng is None else rng
+    i, j = np.triu_indices(matrix.shape[1], 1)
+    differences = matrix[:, i] - matrix[:, j]
+    valid = ~np.isnan(differences)
+    differences = np.where(valid, differences, 0.0)
+    counts = np.maximum(valid.sum(axis=0), 1)
+    observed = np.abs(differences.sum(axis=0)) / counts
+    at_least = np.zeros(len(i))
+    for start in range(0, n_samples, CHUNK_SIZE):
+        signs = rng.choice([-1.0, 1.0], size=(min(CHUNK_SIZE, n_samples - start), matrix.shape[0]))
+        permuted = np.abs(signs @ differences) / counts
+        # Tolerance for floating-point noise, so a flip that reproduces the observed sum counts
+        at_least += (permuted >= observed - 1e-12).sum(axis=0)
+    return i, j, differences.sum(axis=0) / counts, (at_least + 1) / (n_samples + 1)
+
+
+# ── Meta-evaluation ──────────────────────────────────────────────────────────
+
+def meta_evaluate(human_per_topic, auto_per_topic, score_column="score", bootstrap_samples=BOOTSTRAP_SAMPLES,
+                  permutation_samples=PERMUTATION_SAMPLES, seed=0, p=RBO_P, alpha=ALPHA):
+    # How well the automatic run ranking reproduces the human one: Kendall's tau-b and RBO with paired
+    # bootstrap confidence intervals, and whether significance tests between runs reach the same
+    # conclusions. Returns a summary row, per-run scores with intervals and per-pair test results.
+    human, auto, topics, runs = score_matrices(human_per_topic, auto_per_topic, score_column)
+    rng = np.random.default_rng(seed)
+    human_scores, auto_scores = run_means(human), run_means(auto)
+    human_means, auto_means, taus, rbos = paired_bootstrap(human, auto, bootstrap_samples, rng, p)
+
+    run_scores = pd.DataFrame({
+        "run_tag": runs,
+        "human_score": human_scores,
+        "human_ci_low": np.nanpercentile(human_means, 2.5, axis=0),
+        "human_ci_high": np.nanpercentile(human_means, 97.5, axis=0),
+        "auto_score": auto_scores,
+        "auto_ci_low": np.nanpercentile(auto_means, 2.5, axis=0),
+        "auto_ci_high": np.nanpercentile(auto_means, 97.5, axis=0),
+    }).sort_values("human_score", ascending=False)
+    run_scores["human_rank"] = run_scores["human_score"].rank(ascending=False, method="min").astype(int)
+    run_scores["auto_rank"] = run_scores["auto_score"].rank(ascending=False, method="min").astype(int)
+
+    i, j, human_diff, human_p = randomization_test(human, permutation_samples, rng)
+    _, _, auto_diff, auto_p = randomization_test(auto, permutation_samples, rng)
+    pairs = pd.DataFrame({
+        "run_a": np.array(runs)[i],
+        "run_b": np.array(runs)[j],
+        "human_difference": human_diff,
+        "human_p_value": human_p,
+        "auto_difference": auto_diff,
+        "auto_p_value": auto_p,
+    })
+    human_significant = human_p < alpha
+    auto_significant = auto_p < alpha
+    # Same conclusion: both find no significant difference, or both find one in the same direction
+    pairs["same_conclusion"] = ((~human_significant & ~auto_significant) |
+                                (human_significant & auto_significant & (np.sign(human_diff) == np.sign(auto_diff))))
+
+    summary = {
+        "score_column": score_column,
+        "runs": len(runs),
+        "topics": len(topics),
+        "kendall_tau_b": float(kendall_tau_b(human_scores, auto_scores)),
+        "kendall_tau_b_ci_low": float(np.nanpercentile(taus, 2.5)),
+        "kendall_tau_b_ci_high": float(np.nanpercentile(taus, 97.5)),
+        "rbo": float(rbo(human_scores, auto_scores, p)),
+        "rbo_ci_low": float(np.percentile(rbos, 2.5)),
+        "rbo_ci_high": float(np.percentile(rbos, 97.5)),
+        "human_significant_pairs": int(human_significant.sum()),
+        "auto_significant_pairs": int(auto_significant.sum()),
+        "both_significant_same_direction": int((human_significant & auto_significant &
+                                                (np.sign(human_diff) == np.sign(auto_diff))).sum()),
+        "significance_agreement": float(pairs["same_conclusion"].mean()) if len(pairs) else float("nan"),
+    }
+    return summary, run_scores.reset_index(drop=True), pairs
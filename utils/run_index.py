@@ -0,0 +1,114 @@
+import os
+import glob
+import json
+import pickle
+import hashlib
+import pandas as pd
+from typing import NamedTuple
+
+
+CACHE_FOLDER = "index_cache"  # Created in the data folder of the collection being indexed
+INDEX_VERSION = 1  # Bump when the record layout changes to invalidate existing caches
+
+
+class QuestionRecord(NamedTuple):
+    topic_id: str
+    team: str
+    run_tag: str
+    run_question_rank: int
+    run_question_text: str
+
+
+class ReportRecord(NamedTuple):
+    topic_id: str
+    run_tag: str
+    report: str
+
+
+# ── Cached index building ────────────────────────────────────────────────────
+
+def fingerprint(paths):
+    # Size and mtime are enough to notice edited, replaced, added or removed run files
+    return [(os.path.basename(p), os.path.getsize(p), os.stat(p).st_mtime_ns) for p in paths]
+
+
+def cached_index(kind, paths, build, cache_dir):
+    if cache_dir is None:
+        return build(paths)
+    source = hashlib.sha256(json.dumps([kind, [os.path.abspath(p) for p in paths]]).encode()).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"{kind}-{source}.pkl")
+    current = [INDEX_VERSION, fingerprint(paths)]
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            stored, index = pickle.load(f)
+        if stored == current:
+            return index
+
+    index = build(paths)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump((current, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return index
+
+
+def build_question_index(paths):
+    index = {}
+    for path in paths:
+        df = pd.read_csv(path, sep="\t", header=None,
+                         names=["topic_id", "team", "run_tag", "run_question_rank", "run_question_text"])
+        run_tag = os.path.basename(path)
+        for topic_id, team, _, rank, text in df.itertuples(index=False, name=None):
+            index.setdefault((topic_id, run_tag), []).append(
+                QuestionRecord(topic_id, team, run_tag, int(rank), text))
+    return index
+
+
+def build_report_index(paths):
+    index = {}
+    for path in paths:
+        run_tag = os.path.basename(path)
+        with open(path) as f:
+            for line in f:
+                data = json.loads(line)
+                topic_id = data["metadata"]["topic_id"]
+                report_text = " ".join(s["text"] for s in data["responses"])
+                # Keep the first report if a run submits a topic twice (the original script judged both)
+                if (topic_id, run_tag) in index:
+                    print(f"Warning: {run_tag} submits topic {topic_id} more than once in {path}; "
+                          f"only its first report is judged")
+                    continue
+                index[(topic_id, run_tag)] = ReportRecord(topic_id, run_tag, report_text)
+    return index
+
+
+def build_rubric_index(paths):
+    index = {}
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        index[data["topic_id"]] = data["rubrics"]
+    return index
+
+
+# ── Public loaders ───────────────────────────────────────────────────────────
+
+# Without a cache_dir the files are parsed every time; callers pass os.path.join(data_dir, CACHE_FOLDER)
+
+def load_question_runs(input_folder, cache_dir=None):
+    # {(topic_id, run_tag): [QuestionRecord, ...]} in file order
+    paths = sorted(glob.glob(os.path.join(input_folder, "*")))
+    return cached_index("questions", paths, build_question_index, cache_dir)
+
+
+def load_report_runs(input_folder, cache_dir=None):
+    # {(topic_id, run_tag): ReportRecord}
+    paths = sorted(glob.glob(os.path.join(input_folder, "*")))
+    return cached_index("reports", paths, build_report_index, cache_dir)
+
+
+def load_rubric_index(rubrics_dir, cache_dir=None):
+    # {topic_id: rubric questions as stored in the rubric JSON}
+    paths = sorted(glob.glob(os.path.join(rubrics_dir, "*.json")))
+    return cached_index("rubrics", paths, build_rubric_index, cache_dir)
@@ -1,8 +1,11 @@
 import os
-import json
-import glob
+import io
+import csv
 import argparse
+import numpy as np
 import pandas as pd
+from run_index import load_rubric_index, CACHE_FOLDER
+from meta_eval import meta_evaluate, BOOTSTRAP_SAMPLES, PERMUTATION_SAMPLES, RBO_P, ALPHA
 
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,11 +19,8 @@ IMPORTANCE_MAP = {"A: Have to Know": 4, "B: Good to Know": 2, "C: Nice to Know":
 
 def load_rubrics():
     rows = []
-    for path in sorted(glob.glob(os.path.join(RUBRICS_DIR, "*.json"))):
-        with open(path) as f:
-            data = json.load(f)
-        topic_id = data["topic_id"]
-        for q in data["rubrics"]:
+    for topic_id, topic_rubrics in load_rubric_index(RUBRICS_DIR, os.path.join(DATA_DIR, CACHE_FOLDER)).items():
+        for q in topic_rubrics:
             for a in q["short_answers"]:
                 rows.append({
                     "topic_id": topic_id,
@@ -33,13 +33,68 @@ def load_rubrics():
     return df
 
 
+# ── Partial outputs ──────────────────────────────────────────────────────────
+
+def complete_records(text):
+    # The text up to the end of its last complete CSV record. Rationales may span lines, so a cut after
+    # any newline can still be inside a quoted field; strict parsing fails on such a record.
+    consumed, end = 0, 0
+
+    def lines():
+        nonlocal consumed
+        for line in io.StringIO(text, newline=""):
+            consumed += len(line)
+            yield line
+
+    try:
+        for _ in csv.reader(lines(), strict=True):
+            if text[consumed - 1:consumed] == "\n":
+                end = consumed
+    except csv.Error:
+        pass
+    return text[:end]
+
+
+def read_output(path, partial=False):
+    if not partial:
+        return pd.read_csv(path)
+    # A running AutoJudge job may be midway through writing the last record of its .partial.csv
+    with open(path, newline="") as f:
+        text = complete_records(f.read())
+    return pd.read_csv(io.StringIO(text)).drop(columns="task_index", errors="ignore")
+
+
+def check_missing(assessments, partial, columns):
+    # Only the key, label and weight columns the scores are computed from; other columns, such as
+    # AutoJudge's cascade columns, may be empty
+    missing = assessments[columns].isna().any(axis=1)
+    if not missing.any():
+        return assessments
+    if not partial:
+        raise ValueError("Missing values detected.")
+    # e.g. candidate questions whose compound check has not been written yet
+    print(f"Provisional scores: ignoring {missing.sum()} assessments without a compound label or rubric match")
+    return assessments[~missing]
+
+
+def topics_scored(per_topic):
+    return per_topic.groupby("run_tag").size().rename("topics_scored").reset_index()
+
+
 # ── Question generation scoring ──────────────────────────────────────────────
 
-def score_question_generation(assessments, compound_check, rubrics, output_dir, prefix):
+QUESTION_LABEL_SCORES = {"very-similar": 1, "similar": 0.5, "different": 0, "very-different": 0}
+REPORT_LABEL_SCORES = {"supports": 1, "partial": 0.5, "contradicts": -1, "none": 0}
+
+
+def compute_question_scores(assessments, compound_check, rubrics, by=(), partial=False):
+    # `by` lists extra key columns (e.g. the source file) so many assessment sets are scored in one pass.
+    # `partial` scores an unfinished run: unmatched rows are dropped and each run is normalized by the
+    # rubric questions judged for it so far.
+    by = list(by)
     # Map assessment labels to scores
-    assessments["score"] = assessments["annotation"].map(
-        {"very-similar": 1, "similar": 0.5, "different": 0, "very-different": 0}
-    )
+    assessments = assessments.copy()
+    assessments["score"] = assessments["annotation"].map(QUESTION_LABEL_SCORES)
 
     # Apply compound question penalty: compound questions get zero credit
     assessments = assessments.merge(
@@ -54,68 +109,154 @@ def score_question_generation(assessments, compound_check, rubrics, output_dir,
     assessments = assessments.merge(rubrics, on=["topic_id", "rubric_question_rank"], how="left")
     assessments["score"] = assessments["score"] * assessments["question_score"]
 
-    # Compute per-topic, per-run scores
-    results = []
-    if assessments.isna().any().any():
-        raise "Missing values detected."
-    for topic_id in sorted(assessments["topic_id"].unique()):
-        topic = assessments[assessments["topic_id"] == topic_id]
-        max_score = topic.drop_duplicates(subset=["rubric_question_rank"])["question_score"].sum()
-        for run_tag in sorted(topic["run_tag"].unique()):
-            part = topic[topic["run_tag"] == run_tag]
-            # For each rubric question, only the best-matching submitted question counts
-            per_rq_scores = part.groupby("rubric_question_rank")["score"].max()
-            results.append({"run_tag": run_tag, "topic_id": topic_id, "score": per_rq_scores.sum() / max_score})
-
-    per_topic = pd.DataFrame(results)
+    assessments = check_missing(assessments, partial, by + ["topic_id", "run_tag", "rubric_question_rank", "score",
+                                                          "question_score"])
+
+    # Max possible score per topic: weights of the rubric questions that appear in the assessments
+    norm_keys = by + ["topic_id"] + (["run_tag"] if partial else [])
+    max_score = (assessments.drop_duplicates(subset=norm_keys + ["rubric_question_rank"])
+                 .groupby(norm_keys)["question_score"].sum().rename("max_score"))
+
+    # For each rubric question, only the best-matching submitted question counts. Label scores times
+    # importance weights are small dyadic numbers, so these sums are exact in any summation order.
+    per_rq = assessments.groupby(by + ["topic_id", "run_tag", "rubric_question_rank"])["score"].max()
+    per_topic = per_rq.groupby(level=by + ["topic_id", "run_tag"]).sum().rename("score").reset_index()
+    per_topic = per_topic.merge(max_score.reset_index(), on=norm_keys, how="left")
+    per_topic["score"] = per_topic["score"] / per_topic["max_score"]
+    return per_topic[by + ["run_tag", "topic_id", "score"]]
+
+
+def score_question_generation(assessments, compound_check, rubrics, output_dir, prefix, partial=False):
+    per_topic = compute_question_scores(assessments, compound_check, rubrics, partial=partial)
     per_run = per_topic.groupby("run_tag", as_index=False)["score"].mean().sort_values("score", ascending=False)
+    if partial:
+        per_run = per_run.merge(topics_scored(per_topic), on="run_tag")
 
     per_topic.to_csv(os.path.join(output_dir, f"{prefix}_question_generation_per_topic_results.csv"), index=False)
     per_run.to_csv(os.path.join(output_dir, f"{prefix}_question_generation_per_run_results.csv"), index=False)
     print(per_run.to_string(index=False))
+    return per_topic, per_run
 
 
 # ── Report generation scoring ────────────────────────────────────────────────
 
-def score_report_generation(assessments, rubric_answers, output_dir, prefix):
+def compute_report_scores(assessments, rubric_answers, by=(), partial=False):
+    by = list(by)
     # Map assessment labels to scores
-    assessments["score"] = assessments["annotation"].map(
-        {"supports": 1, "partial": 0.5, "contradicts": -1, "none": 0}
-    )
+    assessments = assessments.copy()
+    assessments["score"] = assessments["annotation"].map(REPORT_LABEL_SCORES)
 
     # Merge rubric importance weights
     assessments = assessments.merge(rubric_answers, on=["topic_id", "answer_id"], how="left")
 
-    # Compute per-topic, per-run scores
-    results = []
-    if assessments.isna().any().any():
-        raise "Missing values detected."
-    for topic_id in sorted(assessments["topic_id"].unique()):
-        rubric_topic = rubric_answers[rubric_answers["topic_id"] == topic_id]
-        max_score = rubric_topic.drop_duplicates(subset=["rubric_question_rank"])["question_score"].sum()
-        for run_tag in sorted(assessments[assessments["topic_id"] == topic_id]["run_tag"].unique()):
-            part = assessments[(assessments["topic_id"] == topic_id) & (assessments["run_tag"] == run_tag)]
-            supportive_total, contradictory_total = 0.0, 0.0
-            for qid in sorted(part["rubric_question_rank"].unique()):
-                q_part = part[part["rubric_question_rank"] == qid]
-                w = q_part["question_score"].iloc[0]
-                n = len(q_part)
-                supportive_total += q_part[q_part["score"] > 0]["score"].sum() / n * w
-                contradictory_total += -q_part[q_part["score"] < 0]["score"].sum() / n * w
-            results.append({
-                "run_tag": run_tag, "topic_id": topic_id,
-                "supportive_score": supportive_total / max_score,
-                "contradictory_score": contradictory_total / max_score,
-            })
-
-    per_topic = pd.DataFrame(results)
+    assessments = check_missing(assessments, partial, by + ["topic_id", "run_tag", "rubric_question_rank", "score",
+                                                          "question_score"])
+
+    # Max possible score per topic: weights of all rubric questions of the topic
+    max_score = (rubric_answers.drop_duplicates(subset=["topic_id", "rubric_question_rank"])
+                 .groupby("topic_id")["question_score"].sum().rename("max_score"))
+
+    # Per rubric question: supportive and contradictory credit, normalized by the number of answers
+    assessments["positive"] = assessments["score"].where(assessments["score"] > 0, 0.0)
+    assessments["negative"] = assessments["score"].where(assessments["score"] < 0, 0.0)
+    per_q = assessments.groupby(by + ["topic_id", "run_tag", "rubric_question_rank"]).agg(
+        w=("question_score", "first"), n=("score", "size"),
+        positive=("positive", "sum"), negative=("negative", "sum"),
+    ).reset_index()
+    per_q["supportive"] = per_q["positive"] / per_q["n"] * per_q["w"]
+    per_q["contradictory"] = -per_q["negative"] / per_q["n"] * per_q["w"]
+
+    # Accumulate the per-question terms in rubric question order, one column at a time, so the
+    # floating-point sums are identical to adding them up question by question
+    group_keys = by + ["topic_id", "run_tag"]
+    per_q["position"] = per_q.groupby(group_keys).cumcount()
+    per_topic = per_q.drop_duplicates(subset=group_keys)[group_keys].reset_index(drop=True)
+    group_index = per_q.groupby(group_keys, sort=True).ngroup().to_numpy()
+    for column in ["supportive", "contradictory"]:
+        terms = np.zeros((len(per_topic), per_q["position"].max() + 1))
+        terms[group_index, per_q["position"].to_numpy()] = per_q[column].to_numpy()
+        total = np.zeros(len(per_topic))
+        for j in range(terms.shape[1]):
+            total = total + terms[:, j]
+        per_topic[f"{column}_total"] = total
+
+    per_topic = per_topic.merge(max_score.reset_index(), on="topic_id", how="left")
+    per_topic["supportive_score"] = per_topic["supportive_total"] / per_topic["max_score"]
+    per_topic["contradictory_score"] = per_topic["contradictory_total"] / per_topic["max_score"]
+    return per_topic[by + ["run_tag", "topic_id", "supportive_score", "contradictory_score"]]
+
+
+def score_report_generation(assessments, rubric_answers, output_dir, prefix, partial=False):
+    per_topic = compute_report_scores(assessments, rubric_answers, partial=partial)
     per_run = per_topic.groupby("run_tag", as_index=False).agg(
         supportive_score=("supportive_score", "mean"), contradictory_score=("contradictory_score", "mean")
     ).sort_values("supportive_score", ascending=False)
+    if partial:
+        per_run = per_run.merge(topics_scored(per_topic), on="run_tag")
 
     per_topic.to_csv(os.path.join(output_dir, f"{prefix}_report_generation_per_topic_results.csv"), index=False)
     per_run.to_csv(os.path.join(output_dir, f"{prefix}_report_generation_per_run_results.csv"), index=False)
     print(per_run.to_string(index=False))
+    return per_topic, per_run
+
+
+# ── Scoring many assessment files ────────────────────────────────────────────
+
+def score_many(task, assessment_paths, rubrics, compound_check=None, label_column="annotation"):
+    # Scores every assessment file in a single grouped pass; returns {path: (per_topic, per_run)}
+    frames = []
+    for path in assessment_paths:
+        df = pd.read_csv(path).rename(columns={label_column: "annotation"})
+        df["assessment_file"] = path
+        frames.append(df)
+    assessments = pd.concat(frames, ignore_index=True)
+
+    if task == "question_generation_evaluation":
+        per_topic = compute_question_scores(assessments, compound_check, rubrics, by=["assessment_file"])
+        score_columns = ["score"]
+    else:
+        per_topic = compute_report_scores(assessments, rubrics, by=["assessment_file"])
+        score_columns = ["supportive_score", "contradictory_score"]
+    per_run = per_topic.groupby(["assessment_file", "run_tag"], as_index=False)[score_columns].mean()
+
+    results = {}
+    for path in assessment_paths:
+        topic_part = per_topic[per_topic["assessment_file"] == path].drop(columns="assessment_file")
+        run_part = per_run[per_run["assessment_file"] == path].drop(columns="assessment_file")
+        results[path] = (topic_part.reset_index(drop=True),
+                         run_part.sort_values(score_columns[0], ascending=False))
+    return results
+
+
+# ── Meta-evaluation ──────────────────────────────────────────────────────────
+
+SCORE_COLUMNS = ["score", "supportive_score", "contradictory_score"]
+
+
+def meta_evaluation(human_path, auto_paths, output_dir, bootstrap_samples=BOOTSTRAP_SAMPLES,
+                    permutation_samples=PERMUTATION_SAMPLES, seed=0, p=RBO_P, alpha=ALPHA):
+    # Compares each automatic per-topic result file with the human one, for every score column in both
+    human = pd.read_csv(human_path)
+    summaries, run_scores, pairs = [], [], []
+    for path in auto_paths:
+        auto = pd.read_csv(path)
+        for column in [c for c in SCORE_COLUMNS if c in human and c in auto]:
+            summary, scores, tests = meta_evaluate(human, auto, column, bootstrap_samples, permutation_samples,
+                                                   seed, p, alpha)
+            summaries.append({"auto_results": path, **summary})
+            run_scores.append(scores.assign(auto_results=path, score_column=column))
+            pairs.append(tests.assign(auto_results=path, score_column=column))
+    if not summaries:
+        raise ValueError("No score column in common between the human and automatic results")
+
+    summaries = pd.DataFrame(summaries)
+    run_scores = pd.concat(run_scores, ignore_index=True)
+    pairs = pd.concat(pairs, ignore_index=True)
+    summaries.to_csv(os.path.join(output_dir, "meta_evaluation_summary.csv"), index=False)
+    run_scores.to_csv(os.path.join(output_dir, "meta_evaluation_run_scores.csv"), index=False)
+    pairs.to_csv(os.path.join(output_dir, "meta_evaluation_run_pairs.csv"), index=False)
+    print(summaries.to_string(index=False))
+    return summaries, run_scores, pairs
 
 
 # ── Main ─────────────────────────────────────────────────────────────────────
@@ -123,31 +264,78 @@ def score_report_generation(assessments, rubric_answers, output_dir, prefix):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="DRAGUN Scoring with Human or Automatic Assessments")
     parser.add_argument("--task", required=True,
-                        choices=["question_generation_evaluation", "report_generation_evaluation"])
-    parser.add_argument("--type", required=True, choices=["human", "auto"])
-    parser.add_argument("--assessment_input", required=True,
-                        help="CSV file containing human or automatic assessments")
+                        choices=["question_generation_evaluation", "report_generation_evaluation",
+                                 "meta_evaluation"])
+    parser.add_argument("--type", choices=["human", "auto"], help="Required for the scoring tasks")
+    parser.add_argument("--assessment_input", nargs="+",
+                        help="CSV file(s) containing human or automatic assessments; several files are scored "
+                             "in one pass")
     parser.add_argument("--compound_check_input", required=False,
                         help="CSV file containing compound check assessments (required for question evaluation)")
     parser.add_argument("--output", required=True, help="Folder to write result CSVs")
+    parser.add_argument("--data_dir", default=DATA_DIR, help="Folder containing the human rubrics")
+    parser.add_argument("--allow_partial", action="store_true",
+                        help="Provisional scores from unfinished AutoJudge outputs (e.g. .partial.csv files); "
+                             "several files are combined as parts of one set of assessments")
+    parser.add_argument("--human_results", help="Per-topic results scored with human assessments (meta_evaluation)")
+    parser.add_argument("--auto_results", nargs="+",
+                        help="Per-topic results scored with automatic assessments (meta_evaluation); several files "
+                             "are each compared with the human results")
+    parser.add_argument("--bootstrap_samples", type=int, default=BOOTSTRAP_SAMPLES,
+                        help="Topic resamples for the confidence intervals")
+    parser.add_argument("--permutation_samples", type=int, default=PERMUTATION_SAMPLES,
+                        help="Random sign flips per run pair for the significance tests")
+    parser.add_argument("--rbo_p", type=float, default=RBO_P, help="Persistence of rank-biased overlap")
+    parser.add_argument("--alpha", type=float, default=ALPHA, help="Significance level of the run pair tests")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the resampling")
     args = parser.parse_args()
 
+    if args.task == "meta_evaluation":
+        if args.human_results is None or args.auto_results is None:
+            parser.error("--human_results and --auto_results are required when --task is meta_evaluation")
+        os.makedirs(args.output, exist_ok=True)
+        meta_evaluation(args.human_results, args.auto_results, args.output, args.bootstrap_samples,
+                        args.permutation_samples, args.seed, args.rbo_p, args.alpha)
+        raise SystemExit(0)
+
+    if args.type is None or args.assessment_input is None:
+        parser.error("--type and --assessment_input are required when scoring")
+
     # Conditional validation: compound_check_input is required for question_generation_evaluation
     if args.task == "question_generation_evaluation" and args.compound_check_input is None:
         parser.error("--compound_check_input is required when --task is question_generation_evaluation")
 
+    DATA_DIR = args.data_dir
+    RUBRICS_DIR = os.path.join(DATA_DIR, "human_rubrics")
     os.makedirs(args.output, exist_ok=True)
     rubrics = load_rubrics()
+    label_column = "auto_assessment" if args.type == "auto" else "annotation"
+    compound = read_output(args.compound_check_input, args.allow_partial) if args.compound_check_input else None
+
+    if args.allow_partial:
+        assessments = pd.concat([read_output(p, partial=True) for p in args.assessment_input], ignore_index=True)
+        assessments = assessments.rename(columns={label_column: "annotation"})
+        print(f"Provisional scores from {len(assessments)} assessments")
+        if args.task == "question_generation_evaluation":
+            score_question_generation(assessments, compound, rubrics, args.output, f"{args.type}_provisional", True)
+        else:
+            score_report_generation(assessments, rubrics, args.output, f"{args.type}_provisional", True)
+
+    elif len(args.assessment_input) > 1:
+        kind = "question_generation" if args.task == "question_generation_evaluation" else "report_generation"
+        results = score_many(args.task, args.assessment_input, rubrics, compound, label_column)
+        for path, (per_topic, per_run) in results.items():
+            # Name outputs after the parent folder and file, e.g. auto_output_pair_auto_question_assessments_...
+            name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            prefix = f"{args.type}_{name}_{os.path.splitext(os.path.basename(path))[0]}"
+            per_topic.to_csv(os.path.join(args.output, f"{prefix}_{kind}_per_topic_results.csv"), index=False)
+            per_run.to_csv(os.path.join(args.output, f"{prefix}_{kind}_per_run_results.csv"), index=False)
+            print(f"\n{path}:\n{per_run.to_string(index=False)}")
 
-    if args.task == "question_generation_evaluation":
-        assessments = pd.read_csv(args.assessment_input)
-        if args.type == 'auto':
-            assessments = assessments.rename(columns={"auto_assessment": "annotation"})
-        compound = pd.read_csv(args.compound_check_input)
+    elif args.task == "question_generation_evaluation":
+        assessments = pd.read_csv(args.assessment_input[0]).rename(columns={label_column: "annotation"})
         score_question_generation(assessments, compound, rubrics, args.output, args.type)
 
     elif args.task == "report_generation_evaluation":
-        assessments = pd.read_csv(args.assessment_input)
-        if args.type == 'auto':
-            assessments = assessments.rename(columns={"auto_assessment": "annotation"})
+        assessments = pd.read_csv(args.assessment_input[0]).rename(columns={label_column: "annotation"})
         score_report_generation(assessments, rubrics, args.output, args.type)